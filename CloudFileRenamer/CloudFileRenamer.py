@@ -1,7 +1,101 @@
 import adsk.core
 import adsk.fusion
 import traceback
-import re
+import logging
+import os
+import sys
+import time
+
+# Helper libraries live next to this script so the folder stays self-contained
+_lib_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib')
+if _lib_dir not in sys.path:
+    sys.path.insert(0, _lib_dir)
+
+from file_utils import FileNameCleaner, PROBLEMATIC_CHARS, clean_cache
+from concurrency import AIMDController
+from cloud_scan import rename_files
+from cloud_cache import CachedDataFolder
+from cloud_index import CloudIndex
+from folder_rules import FolderRules
+from reference_graph import ReferenceGraph
+from reports import write_dry_run_csv, DuplicateNameReport, write_duplicate_report_csv, write_option_comparison_csv
+from scan_estimate import ScanEstimator
+from scan_session import ScanSession, STOP_REASONS
+from option_compare import OptionComparison
+
+# Maximum number of cleaned names remembered between projects and runs
+CLEAN_CACHE_SIZE = 10000
+
+# Concurrent cloud API calls (folder listings and renames) start at the
+# initial value and adapt between 1 and the maximum. The Fusion API is only
+# supported on the main thread, and with a maximum of 1 every call is made
+# there in sequence. Higher values call the API from worker threads, which
+# Fusion does not support; only raise them for experiments.
+API_INITIAL_CONCURRENCY = 1
+API_MAX_CONCURRENCY = 1
+
+# Shared by the scan and rename paths so both respect the same limit
+api_controller = AIMDController('Cloud API', initial_limit=API_INITIAL_CONCURRENCY,
+                                max_limit=API_MAX_CONCURRENCY)
+
+# Folder path globs for script mode, e.g. ['*/Archive/**', '**/Obsolete'].
+# Excluded folders are never listed; with include rules only matching
+# folders have their files scanned.
+INCLUDE_FOLDERS = []
+EXCLUDE_FOLDERS = []
+
+# Reference lookups per batch when analysing the impact of renames
+REFERENCE_BATCH_SIZE = 50
+
+# Script mode: rename referenced components before the assemblies that use
+# them, and export a CSV instead of renaming when DRY_RUN is set
+LEAF_FIRST_RENAMES = True
+DRY_RUN = False
+
+# API calls spent sampling projects for the estimate shown before an
+# "All accessible projects" scan
+ESTIMATE_API_BUDGET = 300
+
+# Budgeted scans that run out of time save where they stopped here, and
+# the next run can resume from it. Set an API call budget to also stop
+# after that many folder listings (two calls each).
+SCAN_TOKEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scan_continuation.json')
+SCAN_API_CALL_BUDGET = None
+
+# Duplicate name report: files whose names only differ before cleaning
+# are listed when at least this many share a name. Above the in-memory
+# limit, scanned names are spilled to temporary files.
+DUPLICATE_MIN_CLUSTER_SIZE = 2
+DUPLICATE_MAX_IN_MEMORY = 200000
+
+# Alternatives to the selected rename options for "Compare option sets".
+# Each dict overrides the selected options; the whole scope is walked once
+# and every set is applied to the same names. Nothing is renamed.
+COMPARE_OPTION_SETS = [
+    {'replacement_char': '-'},
+    {'to_lowercase': True},
+]
+
+# Disagreeing files kept for the comparison CSV
+COMPARE_MAX_DIFFERENCES = 5000
+
+# Keep the command registered in the Modify panel and the folder index warm
+# between invocations. Set to False for a one-off scan of the current project.
+RESIDENT_MODE = True
+
+# Seconds before the warm index is rebuilt, to pick up changes made by
+# other users that no event reports
+INDEX_MAX_AGE = 30 * 60
+
+# Folder trees from earlier scans, kept current by data and document events
+cloud_index = CloudIndex(max_age=INDEX_MAX_AGE)
+
+# Event handlers must stay referenced for as long as they are connected
+handlers = []
+event_handlers = []
+
+# Helper library loggers whose messages go to the Text Commands palette
+LOGGED_LIBRARIES = ['concurrency']
 
 def run(context):
     ui = None
@@ -9,8 +103,22 @@ def run(context):
         app = adsk.core.Application.get()
         ui = app.userInterface
         
+        register_log_handler()
+        
+        if RESIDENT_MODE:
+            # Stay loaded with the command in the Modify panel until stop()
+            register_command(ui)
+            register_index_events(app)
+            adsk.autoTerminate(False)
+            return
+        
         ui.messageBox('Advanced Cloud File Renamer is starting...')
         
+        # Cached names are kept between runs, only the counters start over
+        clean_cache.resize(CLEAN_CACHE_SIZE)
+        clean_cache.reset_stats()
+        api_controller.reset_stats()
+        
         # Get current project
         current_doc = app.activeDocument
         if not current_doc or not current_doc.dataFile:
@@ -25,10 +133,21 @@ def run(context):
         ui.messageBox(f'Found project: {current_project.name}\\n\\nScanning for files with special characters...')
         
         # Scan the project for files that need renaming (using default options)
-        files_to_rename = scan_project_for_files(current_project)
+        folder_rules = FolderRules(INCLUDE_FOLDERS, EXCLUDE_FOLDERS)
+        files_to_rename = scan_project_for_files(current_project, folder_rules)
         
         if not files_to_rename:
-            ui.messageBox('No files with special characters found in this project.')
+            message = 'No files with special characters found in this project.'
+            if folder_rules:
+                message += f'\\n\\n{folder_rules.get_summary()}'
+            ui.messageBox(message)
+            return
+        
+        # Count the files that reference each candidate
+        files_to_rename = analyze_references(files_to_rename, LEAF_FIRST_RENAMES)
+        
+        if DRY_RUN:
+            export_dry_run(ui, files_to_rename)
             return
         
         # Show individual file preview
@@ -38,50 +157,54 @@ def run(context):
         if ui:
             ui.messageBox('Error in Advanced Cloud File Renamer:\n{}'.format(traceback.format_exc()))
 
-def scan_project_for_files(project):
+def scan_project_for_files(project, folder_rules=None):
     """Scan project for files that need renaming"""
     files_to_rename = []
     
     try:
         # Get root folder of project
         root_folder = project.rootFolder
-        scan_folder_recursive(root_folder, files_to_rename)
+        scan_folder_recursive(root_folder, files_to_rename, folder_rules)
     except:
         pass
     
     return files_to_rename
 
-def scan_folder_recursive(folder, files_to_rename):
-    """Recursively scan folder for files"""
+def scan_folder_recursive(folder, files_to_rename, folder_rules=None):
+    """Scan a folder and all its subfolders for files"""
     try:
-        # Scan files in current folder
-        data_files = folder.dataFiles
-        for i in range(data_files.count):
-            data_file = data_files.item(i)
-            
-            original_name = data_file.name
-            cleaned_name = clean_filename(original_name)
-            
-            if original_name != cleaned_name:
-                folder_path = get_folder_path(folder)
-                files_to_rename.append({
-                    'data_file': data_file,
-                    'original_name': original_name,
-                    'new_name': cleaned_name,
-                    'folder_path': folder_path
-                })
-        
-        # Scan subfolders
-        sub_folders = folder.dataFolders
-        for i in range(sub_folders.count):
-            sub_folder = sub_folders.item(i)
-            scan_folder_recursive(sub_folder, files_to_rename)
+        cleaner = FileNameCleaner.compile()
+        
+        # Folder listings go through the shared API controller, and folders
+        # still indexed from an earlier scan are served from memory
+        for current_folder, data_files in cloud_index.walk(cloud_index.get_folder(folder), api_controller,
+                                                            folder_rules):
+            for data_file in data_files:
+                original_name = data_file.name
+                
+                # Most names are already clean - only run the full cleaner on dirty ones
+                cleaned_name = cleaner.clean_if_dirty(original_name)
+                
+                if cleaned_name:
+                    folder_path = get_folder_path(current_folder)
+                    files_to_rename.append({
+                        'data_file': data_file,
+                        'original_name': original_name,
+                        'new_name': cleaned_name,
+                        'folder_path': folder_path
+                    })
     except:
         pass
+    
+    api_controller.log_settled_limit()
 
 def get_folder_path(folder):
     """Get the full path of a folder"""
     try:
+        # Cached folders build their path once from the cached parent chain
+        if isinstance(folder, CachedDataFolder):
+            return folder.path
+        
         path_parts = []
         current_folder = folder
         
@@ -93,6 +216,143 @@ def get_folder_path(folder):
     except:
         return 'Unknown Path'
 
+def analyze_references(files_to_rename, leaf_first=True):
+    """Annotate candidates with their reference counts, optionally ordered leaf-first"""
+    try:
+        graph = ReferenceGraph(api_controller, batch_size=REFERENCE_BATCH_SIZE)
+        graph.build([file_info['data_file'] for file_info in files_to_rename])
+        graph.annotate(files_to_rename)
+        if leaf_first:
+            files_to_rename = graph.leaf_first(files_to_rename)
+    except:
+        pass
+    
+    return files_to_rename
+
+def get_reference_description(file_info):
+    """Describe how many files reference a candidate"""
+    if 'inbound_references' not in file_info:
+        return 'Unknown'
+    
+    description = f"{file_info['inbound_references']} files"
+    if file_info['affected_files'] > file_info['inbound_references']:
+        description += f" ({file_info['affected_files']} affected in total)"
+    referenced_by = file_info['referenced_by']
+    if referenced_by:
+        description += f": {', '.join(referenced_by[:3])}"
+        if len(referenced_by) > 3:
+            description += f', ... and {len(referenced_by) - 3} more'
+    return description
+
+def export_dry_run(ui, files_to_rename):
+    """Export the planned renames to a CSV file without renaming anything"""
+    try:
+        file_dialog = ui.createFileDialog()
+        file_dialog.isMultiSelectEnabled = False
+        file_dialog.title = 'Export Dry Run'
+        file_dialog.filter = 'CSV files (*.csv)'
+        file_dialog.initialFilename = 'cloud_file_renames.csv'
+        
+        if file_dialog.showSave() != adsk.core.DialogResults.DialogOK:
+            ui.messageBox('Dry run export cancelled')
+            return
+        
+        exported_count = write_dry_run_csv(file_dialog.filename, files_to_rename)
+        ui.messageBox(f'Exported {exported_count} planned renames to:\\n{file_dialog.filename}\\n\\nNo files were renamed.')
+    except:
+        ui.messageBox('Dry run export failed:\n{}'.format(traceback.format_exc()))
+
+def export_duplicate_report(ui, duplicate_report):
+    """Export clusters of files whose names clash after cleaning to a CSV file"""
+    try:
+        file_dialog = ui.createFileDialog()
+        file_dialog.isMultiSelectEnabled = False
+        file_dialog.title = 'Export Duplicate Name Report'
+        file_dialog.filter = 'CSV files (*.csv)'
+        file_dialog.initialFilename = 'duplicate_names_partial.csv' if duplicate_report.partial else 'duplicate_names.csv'
+        
+        if file_dialog.showSave() != adsk.core.DialogResults.DialogOK:
+            ui.messageBox('Duplicate name report cancelled')
+            return
+        
+        cluster_count = write_duplicate_report_csv(file_dialog.filename, duplicate_report)
+        ui.messageBox(f'{duplicate_report.get_summary()}\\n\\n'
+                      f'Exported {cluster_count} clusters of clashing names to:\\n{file_dialog.filename}')
+    except:
+        ui.messageBox('Duplicate name report failed:\n{}'.format(traceback.format_exc()))
+
+def export_option_comparison(ui, option_comparison):
+    """Show the outcome of each compared option set and export where they disagree"""
+    try:
+        summary = option_comparison.get_summary()
+        if not option_comparison.disagreements:
+            ui.messageBox(summary)
+            return
+        
+        result = ui.messageBox(
+            f'{summary}\\n\\nExport the files they disagree on to CSV?',
+            'Compare Option Sets',
+            adsk.core.MessageBoxButtonTypes.YesNoButtonType
+        )
+        if result != adsk.core.DialogResults.DialogYes:
+            return
+        
+        file_dialog = ui.createFileDialog()
+        file_dialog.isMultiSelectEnabled = False
+        file_dialog.title = 'Export Option Comparison'
+        file_dialog.filter = 'CSV files (*.csv)'
+        file_dialog.initialFilename = 'option_comparison.csv'
+        
+        if file_dialog.showSave() != adsk.core.DialogResults.DialogOK:
+            return
+        
+        exported_count = write_option_comparison_csv(file_dialog.filename, option_comparison)
+        ui.messageBox(f'Exported {exported_count} of {option_comparison.disagreements} disagreeing files to:\\n'
+                      f'{file_dialog.filename}\\n\\nNo files were renamed.')
+    except:
+        ui.messageBox('Option comparison failed:\n{}'.format(traceback.format_exc()))
+
+def load_scan_token():
+    """Load the continuation token of an unfinished scan, None if there is none"""
+    try:
+        with open(SCAN_TOKEN_FILE, 'r', encoding='utf-8') as token_file:
+            return token_file.read() or None
+    except OSError:
+        return None
+
+def save_scan_token(continuation_token):
+    """Save where an unfinished scan stopped, or forget it once a scan completes"""
+    if continuation_token:
+        with open(SCAN_TOKEN_FILE, 'w', encoding='utf-8') as token_file:
+            token_file.write(continuation_token)
+    elif os.path.exists(SCAN_TOKEN_FILE):
+        os.remove(SCAN_TOKEN_FILE)
+
+def store_scan_token(ui, continuation_token, resumed, finished):
+    """Save where a scan stopped without losing another scan's saved position
+
+    A resumed scan moves the saved position on, or forgets it once it
+    finishes. A new scan only replaces a saved position if the user
+    agrees. Returns True if continuation_token was saved.
+    """
+    if resumed:
+        if continuation_token or finished:
+            save_scan_token(continuation_token)
+        return continuation_token is not None
+    if not continuation_token:
+        return False
+    if load_scan_token():
+        result = ui.messageBox(
+            'Another unfinished scan is saved.\n\n'
+            'Replace its saved position with where this scan stopped?',
+            'Unfinished Scan',
+            adsk.core.MessageBoxButtonTypes.YesNoButtonType
+        )
+        if result != adsk.core.DialogResults.DialogYes:
+            return False
+    save_scan_token(continuation_token)
+    return True
+
 def show_file_preview(ui, files_to_rename):
     """Show individual file preview and approval"""
     try:
@@ -106,10 +366,9 @@ def show_file_preview(ui, files_to_rename):
             
             # Highlight problematic characters
             display_original = original_name
-            problematic_chars = ['"', "'", '/', '\\', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '+', '=', '[', ']', '{', '}', ';', ':', '|', '<', '>', '?', ',', '.', '`', '~', ' ']
             problem_chars_found = []
             
-            for char in problematic_chars:
+            for char in PROBLEMATIC_CHARS:
                 if char in display_original:
                     if char == ' ':
                         problem_chars_found.append('SPACE')
@@ -121,7 +380,8 @@ def show_file_preview(ui, files_to_rename):
             preview_msg = f'Location: {folder_path}\\n\\n'
             preview_msg += f'Current name: {display_original}\\n'
             preview_msg += f'New name: {new_name}\\n\\n'
-            preview_msg += f'Problems found: {", ".join(problem_chars_found)}\\n\\n'
+            preview_msg += f'Problems found: {", ".join(problem_chars_found)}\\n'
+            preview_msg += f'Referenced by: {get_reference_description(file_info)}\\n\\n'
             preview_msg += f'Rename this file?\\n\\n'
             preview_msg += f'(File {len(files_to_process) + skipped_count + 1} of {len(files_to_rename)})'
             
@@ -163,20 +423,9 @@ def show_file_preview(ui, files_to_rename):
 
 def perform_cloud_file_renames(ui, files_to_rename):
     """Perform the actual cloud file renames"""
-    renamed_count = 0
-    failed_files = []
-    
-    for file_info in files_to_rename:
-        try:
-            data_file = file_info['data_file']
-            new_name = file_info['new_name']
-            
-            # Rename the cloud file
-            data_file.name = new_name
-            renamed_count += 1
-            
-        except Exception as e:
-            failed_files.append(f"{file_info['original_name']}: {str(e)}")
+    # Rename the cloud files through the shared API controller
+    renamed_count, failed_files = rename_files(files_to_rename, api_controller, on_stale=cloud_index.file_changed)
+    api_controller.log_settled_limit()
     
     # Show results
     result_message = f'Successfully renamed {renamed_count} of {len(files_to_rename)} cloud files'
@@ -188,33 +437,62 @@ def perform_cloud_file_renames(ui, files_to_rename):
         if len(failed_files) > 5:
             result_message += f'\\n... and {len(failed_files) - 5} more'
     
+    # The name cache is only used by scans that cover several projects
+    if clean_cache.hits or clean_cache.misses:
+        result_message += f'\\n\\n{clean_cache.get_summary()}'
+    result_message += f'\\n\\n{api_controller.get_summary()}'
+    
     ui.messageBox(result_message)
 
 def clean_filename(filename):
     """Clean a filename by replacing special characters"""
-    cleaned = filename
-    
-    # Replace spaces
-    cleaned = cleaned.replace(' ', '_')
-    
-    # Replace special characters (including quotes and slashes)
-    special_chars = r'[!@#$%^&*()+=\[\]{};:"|<>?,./\\`~\'"]'
-    cleaned = re.sub(special_chars, '_', cleaned)
-    
-    # Replace unicode characters (keep only ASCII)
-    cleaned = cleaned.encode('ascii', 'ignore').decode('ascii')
-    
-    # Clean up multiple consecutive replacement characters
-    cleaned = re.sub('_+', '_', cleaned)
+    return FileNameCleaner.clean_filename(filename)
+
+def register_command(ui):
+    """Register the command and add it to the Modify panel"""
+    cmd_defs = ui.commandDefinitions
+    cmd_def = cmd_defs.itemById('CloudFileRenamerCmd')
+    if not cmd_def:
+        cmd_def = cmd_defs.addButtonDefinition(
+            'CloudFileRenamerCmd',
+            'Cloud File Renamer',
+            'Rename cloud files containing spaces and special characters'
+        )
     
-    # Remove leading/trailing replacement characters
-    cleaned = cleaned.strip('_')
+    on_command_created = CloudFileRenamerCommandCreated()
+    cmd_def.commandCreated.add(on_command_created)
+    handlers.append(on_command_created)
     
-    # Ensure we don't have an empty filename
-    if not cleaned:
-        cleaned = 'unnamed_file'
+    design_workspace = ui.workspaces.itemById('FusionSolidEnvironment')
+    if design_workspace:
+        modify_panel = design_workspace.toolbarPanels.itemById('SolidModifyPanel')
+        if modify_panel and not modify_panel.controls.itemById('CloudFileRenamerCmd'):
+            modify_panel.controls.addCommand(cmd_def)
+
+def register_index_events(app):
+    """Keep the warm index current when files are saved or uploaded"""
+    on_data_file_complete = IndexDataFileCompleteHandler()
+    app.dataFileComplete.add(on_data_file_complete)
+    event_handlers.append((app.dataFileComplete, on_data_file_complete))
     
-    return cleaned
+    on_document_saved = IndexDocumentSavedHandler()
+    app.documentSaved.add(on_document_saved)
+    event_handlers.append((app.documentSaved, on_document_saved))
+
+def register_log_handler():
+    """Send helper library log messages (e.g. the settled concurrency) to the Text Commands palette"""
+    for name in LOGGED_LIBRARIES:
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+        if not any(isinstance(h, TextPaletteLogHandler) for h in logger.handlers):
+            logger.addHandler(TextPaletteLogHandler())
+
+def remove_log_handler():
+    """Disconnect the Text Commands palette log handlers"""
+    for name in LOGGED_LIBRARIES:
+        logger = logging.getLogger(name)
+        for handler in [h for h in logger.handlers if isinstance(h, TextPaletteLogHandler)]:
+            logger.removeHandler(handler)
 
 def stop(context):
     ui = None
@@ -222,6 +500,15 @@ def stop(context):
         app = adsk.core.Application.get()
         ui = app.userInterface
         
+        remove_log_handler()
+        
+        # Disconnect index events and drop the warm index
+        for event, handler in event_handlers:
+            event.remove(handler)
+        event_handlers.clear()
+        handlers.clear()
+        cloud_index.clear()
+        
         # Remove command from UI
         design_workspace = ui.workspaces.itemById('FusionSolidEnvironment')
         if design_workspace:
@@ -242,6 +529,45 @@ def stop(context):
             ui.messageBox('Failed to stop Cloud File Renamer:\n{}'.format(traceback.format_exc()))
 
 
+class TextPaletteLogHandler(logging.Handler):
+    """Writes log records to Fusion's Text Commands palette"""
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter('Cloud File Renamer: %(message)s'))
+        
+    def emit(self, record):
+        try:
+            adsk.core.Application.get().log(self.format(record))
+        except:
+            self.handleError(record)
+
+
+class IndexDataFileCompleteHandler(adsk.core.DataEventHandler):
+    """Marks the folder of an uploaded or saved file stale in the warm index"""
+    def __init__(self):
+        super().__init__()
+        
+    def notify(self, args):
+        try:
+            cloud_index.file_changed(args.file)
+        except:
+            cloud_index.clear()
+
+
+class IndexDocumentSavedHandler(adsk.core.DocumentEventHandler):
+    """Marks the folder of a saved document stale in the warm index"""
+    def __init__(self):
+        super().__init__()
+        
+    def notify(self, args):
+        try:
+            data_file = args.document.dataFile
+            if data_file:
+                cloud_index.file_changed(data_file)
+        except:
+            cloud_index.clear()
+
+
 class CloudFileRenamerCommandCreated(adsk.core.CommandCreatedEventHandler):
     def __init__(self):
         super().__init__()
@@ -253,6 +579,7 @@ class CloudFileRenamerCommandCreated(adsk.core.CommandCreatedEventHandler):
             # Connect to execute event
             on_execute = CloudFileRenamerCommandExecute()
             cmd.executed.add(on_execute)
+            handlers.append(on_execute)
             
             # Create command inputs
             inputs = cmd.commandInputs
@@ -265,6 +592,9 @@ class CloudFileRenamerCommandCreated(adsk.core.CommandCreatedEventHandler):
             scope_inputs.addBoolValueInput('scan_current_project', 'Current Project only', '', True)
             scope_inputs.addBoolValueInput('scan_all_projects', 'All accessible projects', '', False)
             scope_inputs.addBoolValueInput('scan_current_folder', 'Current folder and subfolders', '', False)
+            scope_inputs.addBoolValueInput('estimate_first', 'Estimate before scanning all projects', '', True)
+            scope_inputs.addIntegerSpinnerCommandInput('scan_minutes', 'Scan time limit (minutes, 0 = none)', 0, 600, 5, 0)
+            scope_inputs.addBoolValueInput('resume_scan', 'Resume the unfinished scan', '', os.path.exists(SCAN_TOKEN_FILE))
             
             # Add file type selection
             file_types_group = inputs.addGroupCommandInput('file_types', 'Include File Types')
@@ -277,6 +607,14 @@ class CloudFileRenamerCommandCreated(adsk.core.CommandCreatedEventHandler):
             file_types_inputs.addBoolValueInput('include_cad_files', 'Imported CAD files', '', True)
             file_types_inputs.addBoolValueInput('include_other', 'Other file types', '', False)
             
+            # Add folder rules (comma-separated globs such as */Archive/**)
+            folder_rules_group = inputs.addGroupCommandInput('folder_rules_group', 'Folder Filters')
+            folder_rules_group.isExpanded = False
+            folder_rules_inputs = folder_rules_group.children
+            
+            folder_rules_inputs.addStringValueInput('include_folders', 'Only scan folders matching', '')
+            folder_rules_inputs.addStringValueInput('exclude_folders', 'Skip folders matching', '')
+            
             # Add rename options
             options_group = inputs.addGroupCommandInput('options_group', 'Rename Options')
             options_group.isExpanded = True
@@ -287,6 +625,10 @@ class CloudFileRenamerCommandCreated(adsk.core.CommandCreatedEventHandler):
             options_inputs.addBoolValueInput('replace_unicode', 'Replace unicode characters', '', True)
             options_inputs.addBoolValueInput('to_lowercase', 'Convert to lowercase', '', False)
             options_inputs.addStringValueInput('replacement_char', 'Replacement character', '_')
+            options_inputs.addBoolValueInput('leaf_first', 'Rename referenced components before assemblies', '', True)
+            options_inputs.addBoolValueInput('dry_run', 'Dry run (export CSV, no renames)', '', False)
+            options_inputs.addBoolValueInput('duplicate_report', 'Report names that clash after cleaning (CSV)', '', False)
+            options_inputs.addBoolValueInput('compare_options', 'Compare option sets (no renames)', '', False)
             
         except:
             ui = adsk.core.Application.get().userInterface
@@ -303,6 +645,12 @@ class CloudFileRenamerCommandExecute(adsk.core.CommandEventHandler):
             app = adsk.core.Application.get()
             ui = app.userInterface
             
+            # Cached names are kept between runs, only the counters start over
+            clean_cache.resize(CLEAN_CACHE_SIZE)
+            clean_cache.reset_stats()
+            cloud_index.reset_stats()
+            api_controller.reset_stats()
+            
             # Get command inputs
             inputs = args.command.commandInputs
             
@@ -325,140 +673,285 @@ class CloudFileRenamerCommandExecute(adsk.core.CommandEventHandler):
             to_lowercase = inputs.itemById('to_lowercase').value
             replacement_char = inputs.itemById('replacement_char').value
             
-            # Scan for files in Fusion 360 cloud
-            files_to_rename = self.scan_cloud_files(
+            # Get impact analysis options
+            leaf_first = inputs.itemById('leaf_first').value
+            dry_run = inputs.itemById('dry_run').value
+            selected_options = {
+                'replace_spaces': replace_spaces,
+                'replace_special': replace_special,
+                'replace_unicode': replace_unicode,
+                'to_lowercase': to_lowercase,
+                'replacement_char': replacement_char
+            }
+            
+            duplicate_report = None
+            if inputs.itemById('duplicate_report').value:
+                duplicate_report = DuplicateNameReport(FileNameCleaner.compile(selected_options),
+                                                       DUPLICATE_MIN_CLUSTER_SIZE, DUPLICATE_MAX_IN_MEMORY)
+            
+            # Every alternative option set is applied during the same walk
+            option_comparison = None
+            if inputs.itemById('compare_options').value:
+                option_comparison = OptionComparison(selected_options, COMPARE_OPTION_SETS, COMPARE_MAX_DIFFERENCES)
+            
+            # Get folder rules
+            include_folders = inputs.itemById('include_folders').value
+            exclude_folders = inputs.itemById('exclude_folders').value
+            folder_rules = FolderRules(include_folders, exclude_folders)
+            
+            # Get the scan budget, and where an unfinished scan stopped
+            scan_minutes = inputs.itemById('scan_minutes').value
+            time_budget = scan_minutes * 60 if scan_minutes else None
+            continuation_token = load_scan_token() if inputs.itemById('resume_scan').value else None
+            
+            # Offer a quick sampled estimate before walking every project
+            if scan_all_projects and not continuation_token and inputs.itemById('estimate_first').value:
+                estimate = self.estimate_all_projects(
+                    app, include_designs, include_drawings, include_simulations, include_cad_files, include_other,
+                    replace_spaces, replace_special, replace_unicode, to_lowercase, replacement_char,
+                    FolderRules(include_folders, exclude_folders)
+                )
+                if estimate:
+                    estimate_msg = f'Estimate for all accessible projects:\\n\\n{estimate.get_summary()}'
+                    estimate_msg += '\\n\\nRun the full scan now?'
+                    result = ui.messageBox(
+                        estimate_msg,
+                        'Scan Estimate',
+                        adsk.core.MessageBoxButtonTypes.YesNoButtonType
+                    )
+                    if result != adsk.core.DialogResults.DialogYes:
+                        return
+            
+            # Scan for files in Fusion 360 cloud, stopping when the budget runs out
+            resumed = continuation_token is not None
+            files_to_rename, continuation_token, stop_message = self.scan_cloud_files_resumable(
                 app, scan_current_project, scan_all_projects, scan_current_folder,
                 include_designs, include_drawings, include_simulations, include_cad_files, include_other,
-                replace_spaces, replace_special, replace_unicode, to_lowercase, replacement_char
+                replace_spaces, replace_special, replace_unicode, to_lowercase, replacement_char, folder_rules,
+                time_budget, SCAN_API_CALL_BUDGET, continuation_token, duplicate_report, option_comparison
             )
+            token_saved = store_scan_token(ui, continuation_token, resumed, stop_message is None)
+            
+            if duplicate_report:
+                # Budgeted and resumed scans only report the folders scanned this time
+                duplicate_report.partial = resumed or stop_message is not None
+                with duplicate_report:
+                    export_duplicate_report(ui, duplicate_report)
+            
+            if stop_message:
+                if token_saved:
+                    stop_message += ('\n\nRun the command again with "Resume the unfinished scan" '
+                                     'to continue from where it stopped.')
+                elif continuation_token:
+                    stop_message += ('\n\nWhere this scan stopped was not saved. '
+                                     'The earlier unfinished scan can still be resumed.')
+                ui.messageBox(f'{stop_message}\n\nFiles found so far: {len(files_to_rename)}')
+            
+            # Comparisons only report, nothing is renamed
+            if option_comparison:
+                option_comparison.partial = resumed or stop_message is not None
+                export_option_comparison(ui, option_comparison)
+                return
             
             if not files_to_rename:
-                ui.messageBox('No files with special characters found in the selected scope.')
+                message = 'No files with special characters found in the selected scope.'
+                if folder_rules:
+                    message += f'\\n\\n{folder_rules.get_summary()}'
+                if clean_cache.hits or clean_cache.misses:
+                    message += f'\\n\\n{clean_cache.get_summary()}'
+                ui.messageBox(message)
+                return
+            
+            # Count the files that reference each candidate
+            files_to_rename = analyze_references(files_to_rename, leaf_first)
+            
+            if dry_run:
+                export_dry_run(ui, files_to_rename)
                 return
             
             # Show preview
-            ui.messageBox(f'Found {len(files_to_rename)} files to rename.\\n\\nStarting individual file review...')
+            found_msg = f'Found {len(files_to_rename)} files to rename.'
+            if folder_rules:
+                found_msg += f'\\n{folder_rules.get_summary()}'
+            found_msg += f'\\n{cloud_index.get_summary()}'
+            if clean_cache.hits or clean_cache.misses:
+                found_msg += f'\\n{clean_cache.get_summary()}'
+            ui.messageBox(f'{found_msg}\\n\\nStarting individual file review...')
             self.show_file_preview(ui, files_to_rename)
             
         except:
             if ui:
                 ui.messageBox('Execute failed:\n{}'.format(traceback.format_exc()))
     
-    def scan_cloud_files(self, app, scan_current_project, scan_all_projects, scan_current_folder,
-                        include_designs, include_drawings, include_simulations, include_cad_files, include_other,
-                        replace_spaces, replace_special, replace_unicode, to_lowercase, replacement_char):
-        """Scan Fusion 360 cloud files for renaming"""
+    def scan_cloud_files_resumable(self, app, scan_current_project, scan_all_projects, scan_current_folder,
+                                   include_designs, include_drawings, include_simulations, include_cad_files,
+                                   include_other, replace_spaces, replace_special, replace_unicode, to_lowercase,
+                                   replacement_char, folder_rules=None, time_budget=None, call_budget=None,
+                                   continuation_token=None, duplicate_report=None, option_comparison=None):
+        """Scan within a time (seconds) or API call budget
+        
+        Returns (files_to_rename, continuation_token, stop_message). The
+        token and message are None once the whole scope has been scanned.
+        Passing the token back in continues the scan where it stopped,
+        including folders that failed; the scope it was started with is
+        kept and the scope options are ignored. Every included file is
+        also added to duplicate_report and option_comparison, if given.
+        """
         files_to_rename = []
+        session = None
+        scan_error = None
         
         try:
-            # Get the data manager
-            data_mgr = app.data
-            
-            if scan_current_project:
-                # Get current project
-                current_doc = app.activeDocument
-                if current_doc and current_doc.dataFile:
-                    current_project = current_doc.dataFile.parentProject
-                    if current_project:
-                        files_to_rename.extend(self.scan_project_files(
-                            current_project, include_designs, include_drawings, include_simulations, 
-                            include_cad_files, include_other, replace_spaces, replace_special, 
-                            replace_unicode, to_lowercase, replacement_char
-                        ))
-            
-            elif scan_all_projects:
-                # Get all projects (this might be limited by permissions)
-                hub = data_mgr.activeHub
-                if hub:
-                    projects = hub.dataProjects
-                    for i in range(projects.count):
-                        project = projects.item(i)
-                        files_to_rename.extend(self.scan_project_files(
-                            project, include_designs, include_drawings, include_simulations,
-                            include_cad_files, include_other, replace_spaces, replace_special,
-                            replace_unicode, to_lowercase, replacement_char
-                        ))
-            
-            elif scan_current_folder:
-                # Get current folder and scan recursively
-                current_doc = app.activeDocument
-                if current_doc and current_doc.dataFile:
-                    current_folder = current_doc.dataFile.parentFolder
-                    if current_folder:
-                        files_to_rename.extend(self.scan_folder_recursive(
-                            current_folder, include_designs, include_drawings, include_simulations,
-                            include_cad_files, include_other, replace_spaces, replace_special,
-                            replace_unicode, to_lowercase, replacement_char
-                        ))
+            hub = app.data.activeHub
+            
+            def root_for_project(project_id):
+                project = hub.dataProjects.itemById(project_id) if hub else None
+                return cloud_index.get_folder(project.rootFolder) if project else None
+            
+            if continuation_token:
+                session = ScanSession.from_token(continuation_token, root_for_project, api_controller, folder_rules)
+            else:
+                roots = self.get_scan_roots(app, scan_current_project, scan_all_projects, scan_current_folder)
+                session = ScanSession(roots, root_for_project, api_controller, folder_rules)
+            
+            cleaner = FileNameCleaner.compile({
+                'replace_spaces': replace_spaces,
+                'replace_special': replace_special,
+                'replace_unicode': replace_unicode,
+                'to_lowercase': to_lowercase,
+                'replacement_char': replacement_char
+            })
+            
+            # Names like 'Component 1' repeat across projects, so only multi-project
+            # scans look cleaned names up in the shared cache
+            name_cache = clean_cache if len(session.roots) > 1 else None
+            
+            # Folders still indexed from an earlier scan are served from memory
+            scan_started = time.time()
+            
+            def visit(folder, data_files):
+                cloud_index.record(folder, data_files, scan_started)
+                files_to_rename.extend(self.find_files_to_rename(
+                    folder, data_files, cleaner, include_designs, include_drawings, include_simulations,
+                    include_cad_files, include_other, duplicate_report, option_comparison, name_cache
+                ))
+            
+            session.run(visit, time_budget, call_budget)
                         
         except Exception as e:
-            # Return what we found so far
-            pass
+            # Return what we found so far, the token continues from the failed folder
+            scan_error = e
         
-        return files_to_rename
+        api_controller.log_settled_limit()
+        
+        if session is None:
+            return files_to_rename, None, f'The scan could not start:\n{scan_error}'
+        if session.finished:
+            return files_to_rename, None, None
+        
+        stop_message = f'The scan {STOP_REASONS.get(session.stop_reason, "stopped")}.'
+        error = scan_error or session.error
+        if session.stop_reason == 'error' and error is not None:
+            stop_message += f'\n{error}'
+        return files_to_rename, session.to_token(), stop_message
     
-    def scan_project_files(self, project, include_designs, include_drawings, include_simulations, 
-                          include_cad_files, include_other, replace_spaces, replace_special, 
-                          replace_unicode, to_lowercase, replacement_char):
-        """Scan all files in a project"""
-        files_to_rename = []
+    def get_scan_roots(self, app, scan_current_project, scan_all_projects, scan_current_folder):
+        """Get the (project_id, folder_id_chain) pairs a scan starts from"""
+        roots = []
+        
+        if scan_current_project:
+            # Get current project
+            current_doc = app.activeDocument
+            if current_doc and current_doc.dataFile:
+                current_project = current_doc.dataFile.parentProject
+                if current_project:
+                    roots.append((current_project.id, []))
         
+        elif scan_all_projects:
+            # Get all projects (this might be limited by permissions)
+            hub = app.data.activeHub
+            if hub:
+                projects = hub.dataProjects
+                for i in range(projects.count):
+                    roots.append((projects.item(i).id, []))
+        
+        elif scan_current_folder:
+            # Get current folder and the chain of folders above it up to the project root
+            current_doc = app.activeDocument
+            if current_doc and current_doc.dataFile:
+                current_folder = current_doc.dataFile.parentFolder
+                if current_folder:
+                    chain = []
+                    while current_folder.parentFolder:
+                        chain.insert(0, current_folder.id)
+                        current_folder = current_folder.parentFolder
+                    roots.append((current_doc.dataFile.parentProject.id, chain))
+        
+        return roots
+    
+    def estimate_all_projects(self, app, include_designs, include_drawings, include_simulations,
+                              include_cad_files, include_other, replace_spaces, replace_special,
+                              replace_unicode, to_lowercase, replacement_char, folder_rules=None):
+        """Estimate the size of an all-projects scan from a bounded random sample"""
         try:
-            # Get root folder of project
-            root_folder = project.rootFolder
-            files_to_rename.extend(self.scan_folder_recursive(
-                root_folder, include_designs, include_drawings, include_simulations,
-                include_cad_files, include_other, replace_spaces, replace_special,
-                replace_unicode, to_lowercase, replacement_char
-            ))
+            hub = app.data.activeHub
+            if not hub:
+                return None
+            
+            projects = hub.dataProjects
+            root_folders = [cloud_index.get_folder(projects.item(i).rootFolder) for i in range(projects.count)]
+            
+            cleaner = FileNameCleaner.compile({
+                'replace_spaces': replace_spaces,
+                'replace_special': replace_special,
+                'replace_unicode': replace_unicode,
+                'to_lowercase': to_lowercase,
+                'replacement_char': replacement_char
+            })
+            
+            def include_file(data_file):
+                return self.should_include_file(data_file, include_designs, include_drawings,
+                                                include_simulations, include_cad_files, include_other)
+            
+            estimator = ScanEstimator(cleaner, api_budget=ESTIMATE_API_BUDGET,
+                                      include_file=include_file, folder_rules=folder_rules)
+            return estimator.estimate(root_folders)
         except:
-            pass
-        
-        return files_to_rename
+            return None
     
-    def scan_folder_recursive(self, folder, include_designs, include_drawings, include_simulations,
-                             include_cad_files, include_other, replace_spaces, replace_special,
-                             replace_unicode, to_lowercase, replacement_char):
-        """Recursively scan a folder and its subfolders"""
+    def find_files_to_rename(self, folder, data_files, cleaner, include_designs, include_drawings,
+                             include_simulations, include_cad_files, include_other, duplicate_report=None,
+                             option_comparison=None, name_cache=None):
+        """Get the file_infos for the files in one folder that need renaming"""
         files_to_rename = []
+        included_files = []
         
-        try:
-            # Scan files in current folder
-            data_files = folder.dataFiles
-            for i in range(data_files.count):
-                data_file = data_files.item(i)
+        for data_file in data_files:
+            # Check if we should include this file type
+            if self.should_include_file(data_file, include_designs, include_drawings, 
+                                      include_simulations, include_cad_files, include_other):
                 
-                # Check if we should include this file type
-                if self.should_include_file(data_file, include_designs, include_drawings, 
-                                          include_simulations, include_cad_files, include_other):
-                    
-                    original_name = data_file.name
-                    cleaned_name = self.clean_filename(
-                        original_name, replace_spaces, replace_special,
-                        replace_unicode, to_lowercase, replacement_char
-                    )
-                    
-                    if original_name != cleaned_name:
-                        files_to_rename.append({
-                            'data_file': data_file,
-                            'original_name': original_name,
-                            'new_name': cleaned_name,
-                            'folder_path': self.get_folder_path(folder),
-                            'file_type': self.get_file_type_description(data_file)
-                        })
-            
-            # Recursively scan subfolders
-            sub_folders = folder.dataFolders
-            for i in range(sub_folders.count):
-                sub_folder = sub_folders.item(i)
-                files_to_rename.extend(self.scan_folder_recursive(
-                    sub_folder, include_designs, include_drawings, include_simulations,
-                    include_cad_files, include_other, replace_spaces, replace_special,
-                    replace_unicode, to_lowercase, replacement_char
-                ))
+                original_name = data_file.name
                 
-        except:
-            pass
+                if duplicate_report is not None:
+                    duplicate_report.add(original_name, data_file.fileExtension, self.get_folder_path(folder))
+                if option_comparison is not None:
+                    included_files.append((original_name, data_file.fileExtension))
+                
+                # Most names are already clean - only run the full cleaner on dirty ones
+                cleaned_name = cleaner.clean_if_dirty(original_name, name_cache)
+                
+                if cleaned_name:
+                    files_to_rename.append({
+                        'data_file': data_file,
+                        'original_name': original_name,
+                        'new_name': cleaned_name,
+                        'folder_path': self.get_folder_path(folder),
+                        'file_type': self.get_file_type_description(data_file)
+                    })
+        
+        if option_comparison is not None and included_files:
+            option_comparison.add_folder(self.get_folder_path(folder), included_files)
         
         return files_to_rename
     
@@ -487,6 +980,10 @@ class CloudFileRenamerCommandExecute(adsk.core.CommandEventHandler):
     def get_folder_path(self, folder):
         """Get the full path of a folder"""
         try:
+            # Cached folders build their path once from the cached parent chain
+            if isinstance(folder, CachedDataFolder):
+                return folder.path
+            
             path_parts = []
             current_folder = folder
             
@@ -531,10 +1028,9 @@ class CloudFileRenamerCommandExecute(adsk.core.CommandEventHandler):
                 
                 # Highlight problematic characters
                 display_original = original_name
-                problematic_chars = ['"', "'", '/', '\\', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '+', '=', '[', ']', '{', '}', ';', ':', '|', '<', '>', '?', ',', '.', '`', '~', ' ']
                 problem_chars_found = []
                 
-                for char in problematic_chars:
+                for char in PROBLEMATIC_CHARS:
                     if char in display_original:
                         if char == ' ':
                             problem_chars_found.append('SPACE')
@@ -547,7 +1043,8 @@ class CloudFileRenamerCommandExecute(adsk.core.CommandEventHandler):
                 preview_msg += f'Location: {folder_path}\\n\\n'
                 preview_msg += f'Current name: {display_original}\\n'
                 preview_msg += f'New name: {new_name}\\n\\n'
-                preview_msg += f'Problems found: {", ".join(problem_chars_found)}\\n\\n'
+                preview_msg += f'Problems found: {", ".join(problem_chars_found)}\\n'
+                preview_msg += f'Referenced by: {get_reference_description(file_info)}\\n\\n'
                 preview_msg += f'Rename this file?\\n\\n'
                 preview_msg += f'(File {len(files_to_process) + skipped_count + 1} of {len(files_to_rename)})'
                 
@@ -589,20 +1086,9 @@ class CloudFileRenamerCommandExecute(adsk.core.CommandEventHandler):
     
     def perform_cloud_file_renames(self, ui, files_to_rename):
         """Perform the actual cloud file renames"""
-        renamed_count = 0
-        failed_files = []
-        
-        for file_info in files_to_rename:
-            try:
-                data_file = file_info['data_file']
-                new_name = file_info['new_name']
-                
-                # Rename the cloud file
-                data_file.name = new_name
-                renamed_count += 1
-                
-            except Exception as e:
-                failed_files.append(f"{file_info['original_name']}: {str(e)}")
+        # Rename the cloud files through the shared API controller
+        renamed_count, failed_files = rename_files(files_to_rename, api_controller, on_stale=cloud_index.file_changed)
+        api_controller.log_settled_limit()
         
         # Show results
         result_message = f'Successfully renamed {renamed_count} of {len(files_to_rename)} cloud files'
@@ -614,39 +1100,19 @@ class CloudFileRenamerCommandExecute(adsk.core.CommandEventHandler):
             if len(failed_files) > 5:
                 result_message += f'\\n... and {len(failed_files) - 5} more'
         
+        # The name cache is only used by scans that cover several projects
+        if clean_cache.hits or clean_cache.misses:
+            result_message += f'\\n\\n{clean_cache.get_summary()}'
+        result_message += f'\\n\\n{api_controller.get_summary()}'
+        
         ui.messageBox(result_message)
     
     def clean_filename(self, filename, replace_spaces, replace_special, replace_unicode, to_lowercase, replacement_char):
         """Clean a filename by replacing special characters"""
-        cleaned = filename
-        
-        # Convert to lowercase first if requested
-        if to_lowercase:
-            cleaned = cleaned.lower()
-        
-        # Replace spaces
-        if replace_spaces:
-            cleaned = cleaned.replace(' ', replacement_char)
-        
-        # Replace special characters (including quotes and slashes)
-        if replace_special:
-            special_chars = r'[!@#$%^&*()+=\[\]{};:"|<>?,./\\`~\'"]'
-            cleaned = re.sub(special_chars, replacement_char, cleaned)
-        
-        # Replace unicode characters (keep only ASCII)
-        if replace_unicode:
-            cleaned = cleaned.encode('ascii', 'ignore').decode('ascii')
-        
-        # Clean up multiple consecutive replacement characters
-        if replacement_char:
-            pattern = re.escape(replacement_char) + '+'
-            cleaned = re.sub(pattern, replacement_char, cleaned)
-        
-        # Remove leading/trailing replacement characters
-        cleaned = cleaned.strip(replacement_char)
-        
-        # Ensure we don't have an empty filename
-        if not cleaned:
-            cleaned = 'unnamed_file'
-        
-        return cleaned
\ No newline at end of file
+        return FileNameCleaner.clean_filename(filename, {
+            'replace_spaces': replace_spaces,
+            'replace_special': replace_special,
+            'replace_unicode': replace_unicode,
+            'to_lowercase': to_lowercase,
+            'replacement_char': replacement_char
+        })
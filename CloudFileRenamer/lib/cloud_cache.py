@@ -0,0 +1,168 @@
+"""
+Caching adapters for Fusion 360 DataFolder/DataFile objects
+
+Every property read on a Fusion data object is a call into the API. The
+adapters here materialize each folder's children once per scan and
+remember the properties the scanner reads (name, fileExtension, id,
+parentFolder), so repeated reads during scanning, path building and
+renaming are served from memory.
+"""
+
+import time
+
+
+def materialize(collection):
+    """Turn an API collection into a plain list in one pass
+
+    Uses asArray() where the collection provides it, otherwise reads
+    count once and every item once. Plain sequences are returned as lists.
+    """
+    if isinstance(collection, (list, tuple)):
+        return list(collection)
+    as_array = getattr(collection, 'asArray', None)
+    if as_array is not None:
+        return list(as_array())
+    return [collection.item(i) for i in range(collection.count)]
+
+
+_UNSET = object()
+
+
+class CachedDataFile:
+    """Read-through cache over a DataFile"""
+
+    __slots__ = ('data_file', '_parent', '_name', '_extension', '_id')
+
+    def __init__(self, data_file, parent=None):
+        self.data_file = data_file
+        self._parent = parent if parent is not None else _UNSET
+        self._name = _UNSET
+        self._extension = _UNSET
+        self._id = _UNSET
+
+    @property
+    def name(self):
+        if self._name is _UNSET:
+            self._name = self.data_file.name
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        # Renames always go to the cloud file, then update the cached copy
+        self.data_file.name = value
+        self._name = value
+
+    @property
+    def fileExtension(self):
+        if self._extension is _UNSET:
+            self._extension = self.data_file.fileExtension
+        return self._extension
+
+    @property
+    def id(self):
+        if self._id is _UNSET:
+            self._id = self.data_file.id
+        return self._id
+
+    @property
+    def parentFolder(self):
+        if self._parent is _UNSET:
+            self._parent = wrap_folder(self.data_file.parentFolder)
+        return self._parent
+
+    def __getattr__(self, attribute):
+        # Anything not cached is read from the underlying DataFile
+        return getattr(self.data_file, attribute)
+
+
+class CachedDataFolder:
+    """Read-through cache over a DataFolder and its children"""
+
+    __slots__ = ('data_folder', '_parent', '_name', '_id', '_files', '_folders', '_path',
+                 '_stale_folders', 'listed_at')
+
+    def __init__(self, data_folder, parent=None):
+        self.data_folder = data_folder
+        self._parent = parent if parent is not None else _UNSET
+        self._name = _UNSET
+        self._id = _UNSET
+        self._files = None
+        self._folders = None
+        self._path = None
+        self._stale_folders = None
+        # When the files were last fetched, None if never
+        self.listed_at = None
+
+    @property
+    def name(self):
+        if self._name is _UNSET:
+            self._name = self.data_folder.name
+        return self._name
+
+    @property
+    def id(self):
+        if self._id is _UNSET:
+            self._id = self.data_folder.id
+        return self._id
+
+    @property
+    def parentFolder(self):
+        if self._parent is _UNSET:
+            self._parent = wrap_folder(self.data_folder.parentFolder)
+        return self._parent
+
+    @property
+    def dataFiles(self):
+        """Files in this folder as a list, fetched once"""
+        if self._files is None:
+            self._files = [CachedDataFile(f, self) for f in materialize(self.data_folder.dataFiles)]
+            self.listed_at = time.time()
+        return self._files
+
+    @property
+    def dataFolders(self):
+        """Subfolders of this folder as a list, fetched once"""
+        if self._folders is None:
+            sub_folders = materialize(self.data_folder.dataFolders)
+            if self._stale_folders:
+                # Keep the cached subtrees of subfolders that are still here
+                previous = {folder.id: folder for folder in self._stale_folders}
+                self._folders = [previous.get(f.id) or CachedDataFolder(f, self) for f in sub_folders]
+                self._stale_folders = None
+            else:
+                self._folders = [CachedDataFolder(f, self) for f in sub_folders]
+        return self._folders
+
+    def invalidate(self):
+        """Forget the cached files and subfolder list so they are fetched again
+
+        Subfolders that are still present keep their own cached contents.
+        """
+        if self._folders is not None:
+            self._stale_folders = self._folders
+        self._files = None
+        self._folders = None
+
+    @property
+    def is_listed(self):
+        """True if the children are cached"""
+        return self._files is not None and self._folders is not None
+
+    @property
+    def path(self):
+        """Full path of the folder, built from the cached parent chain"""
+        if self._path is None:
+            parent = self.parentFolder
+            self._path = f'{parent.path} > {self.name}' if parent else self.name
+        return self._path
+
+    def __getattr__(self, attribute):
+        # Anything not cached is read from the underlying DataFolder
+        return getattr(self.data_folder, attribute)
+
+
+def wrap_folder(data_folder):
+    """Wrap a DataFolder in a CachedDataFolder (None and adapters pass through)"""
+    if data_folder is None or isinstance(data_folder, CachedDataFolder):
+        return data_folder
+    return CachedDataFolder(data_folder)
@@ -0,0 +1,111 @@
+"""
+Warm in-memory index of cloud folder trees
+
+Keeps the CachedDataFolder trees from earlier scans so later scans of the
+same projects are answered from memory. Data and document events mark
+the affected folders stale, and they are listed again on the next scan.
+The whole index is dropped after max_age seconds to pick up changes no
+event reports (e.g. files moved by other users).
+"""
+
+import time
+
+from cloud_cache import wrap_folder
+from cloud_scan import walk_folder_tree
+
+
+class CloudIndex:
+    """Folder adapters by id, kept between scans"""
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.folders = {}
+        self.file_folders = {}
+        self.created_at = time.time()
+        self.invalidations = 0
+        self.folders_listed = 0
+        self.folders_from_memory = 0
+
+    def clear(self):
+        """Drop everything in the index"""
+        self.folders = {}
+        self.file_folders = {}
+        self.created_at = time.time()
+
+    def _check_age(self):
+        if self.max_age is not None and time.time() - self.created_at > self.max_age:
+            self.clear()
+
+    def get_folder(self, data_folder):
+        """Return the indexed adapter for a DataFolder, adding it if needed"""
+        self._check_age()
+        folder_id = data_folder.id
+        folder = self.folders.get(folder_id)
+        if folder is None:
+            folder = wrap_folder(data_folder)
+            self.folders[folder_id] = folder
+        return folder
+
+    def walk(self, root_folder, controller=None, folder_rules=None):
+        """walk_folder_tree over indexed folders, recording what was listed
+
+        Folders still cached from an earlier scan are served from memory.
+        """
+        walk_started = time.time()
+        for folder, data_files in walk_folder_tree(root_folder, controller, folder_rules=folder_rules):
+            self.record(folder, data_files, walk_started)
+            yield folder, data_files
+
+    def record(self, folder, data_files, scan_started):
+        """Add a scanned folder and its files to the index
+
+        Folders listed after scan_started count as listed from the cloud,
+        others as served from memory.
+        """
+        if folder.listed_at is not None and folder.listed_at >= scan_started:
+            self.folders_listed += 1
+        else:
+            self.folders_from_memory += 1
+
+        folder_id = folder.id
+        self.folders[folder_id] = folder
+        for data_file in data_files:
+            self.file_folders[data_file.id] = folder_id
+
+    def invalidate_folder(self, folder_id):
+        """Mark a folder stale so its children are listed again"""
+        folder = self.folders.get(folder_id)
+        if folder is not None:
+            folder.invalidate()
+            self.invalidations += 1
+
+    def file_changed(self, data_file):
+        """Update the index after a file was saved, uploaded or moved
+
+        Both the folder the index last saw the file in and its current
+        folder are marked stale.
+        """
+        try:
+            file_id = data_file.id
+            old_folder_id = self.file_folders.get(file_id)
+            if old_folder_id is not None:
+                self.invalidate_folder(old_folder_id)
+
+            parent_folder = data_file.parentFolder
+            if parent_folder is not None:
+                new_folder_id = parent_folder.id
+                if new_folder_id != old_folder_id:
+                    self.invalidate_folder(new_folder_id)
+                self.file_folders[file_id] = new_folder_id
+        except Exception:
+            # A file we can't inspect can't be placed; rebuild on next scan
+            self.clear()
+
+    def reset_stats(self):
+        self.folders_listed = 0
+        self.folders_from_memory = 0
+
+    def get_summary(self):
+        """Get a one-line summary of how the last scans were served"""
+        return (f'Index: {self.folders_from_memory} folders from memory, '
+                f'{self.folders_listed} listed from the cloud, {self.invalidations} invalidated by events')
@@ -0,0 +1,126 @@
+"""
+Cloud folder traversal and rename helpers for the Cloud File Renamer
+
+Works on any objects shaped like the Fusion 360 DataFolder/DataFile API,
+so it can be exercised against a fake API outside of Fusion.
+"""
+
+from cloud_cache import materialize
+
+
+def fetch_folder_contents(folder):
+    """Fetch a folder's files and subfolders as plain lists"""
+    return materialize(folder.dataFiles), materialize(folder.dataFolders)
+
+
+def fetch_all_contents(folders, controller, retries=0):
+    """Fetch the contents of several folders, through the controller if given
+
+    Returns (contents, error) for each folder. Failed fetches are retried
+    up to `retries` times, after the controller has had a chance to back off.
+    """
+    def fetch(batch):
+        if controller:
+            return controller.map(fetch_folder_contents, batch)
+
+        results = []
+        for folder in batch:
+            try:
+                results.append((fetch_folder_contents(folder), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    results = fetch(folders)
+    for _ in range(retries):
+        failed = [i for i, (_, error) in enumerate(results) if error is not None]
+        if not failed:
+            break
+        for i, result in zip(failed, fetch([folders[i] for i in failed])):
+            results[i] = result
+    return results
+
+
+def walk_folder_tree(root_folder, controller=None, retries=2, folder_rules=None):
+    """Yield (folder, data_files) for a folder and all of its subfolders
+
+    Folders are visited depth-first in the same order as a recursive scan.
+    The subfolders of each folder are listed together through the
+    controller, so their dataFiles/dataFolders fetches can overlap.
+    Folders whose contents still can't be fetched after `retries` more
+    attempts are skipped along with their subfolders.
+
+    If folder_rules is given, each folder is checked before it is listed:
+    pruned folders and their subtrees are never fetched, and folders that
+    are only on the way to an included folder yield no files.
+    """
+    def admitted(folders):
+        if not folder_rules:
+            return [(folder, True) for folder in folders]
+        kept = []
+        for folder in folders:
+            descend, include_files = folder_rules.enter(folder)
+            if descend:
+                kept.append((folder, include_files))
+        return kept
+
+    def fetch(entries):
+        listed = fetch_all_contents([folder for folder, _ in entries], controller, retries)
+        return [(folder, include_files, result) for (folder, include_files), result in zip(entries, listed)]
+
+    pending = fetch(admitted([root_folder]))
+
+    while pending:
+        folder, include_files, (contents, error) = pending.pop()
+        if error is not None:
+            continue
+
+        files, sub_folders = contents
+        yield folder, files if include_files else []
+
+        # Push in reverse so the first subfolder is visited first
+        pending.extend(reversed(fetch(admitted(sub_folders))))
+
+
+class StaleNameError(Exception):
+    """The cloud file was renamed after it was scanned"""
+
+
+def _rename(file_info):
+    data_file = file_info['data_file']
+    # Read the live name, not a cached one, so a newer name is never overwritten
+    current_name = getattr(data_file, 'data_file', data_file).name
+    if current_name != file_info['original_name']:
+        raise StaleNameError(f"renamed to '{current_name}' since the scan")
+    data_file.name = file_info['new_name']
+
+
+def rename_files(files_to_rename, controller=None, on_stale=None):
+    """Rename cloud files. Returns (renamed_count, failed_files)
+
+    failed_files holds 'original name: error' strings for each failure.
+    Files whose name changed since the scan are left alone and reported
+    as failed; on_stale(data_file) is called for each so cached folders
+    can be refreshed.
+    """
+    if controller:
+        results = controller.map(_rename, files_to_rename)
+    else:
+        results = []
+        for file_info in files_to_rename:
+            try:
+                results.append((_rename(file_info), None))
+            except Exception as e:
+                results.append((None, e))
+
+    renamed_count = 0
+    failed_files = []
+    for file_info, (_, error) in zip(files_to_rename, results):
+        if error is None:
+            renamed_count += 1
+        else:
+            failed_files.append(f"{file_info['original_name']}: {str(error)}")
+            if on_stale and isinstance(error, StaleNameError):
+                on_stale(file_info['data_file'])
+
+    return renamed_count, failed_files
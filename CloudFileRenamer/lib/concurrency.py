@@ -0,0 +1,156 @@
+"""
+Adaptive concurrency control for Fusion 360 data API calls
+
+The AIMDController limits how many cloud calls (folder listings, renames)
+are in flight at once. It raises the limit additively while latency and
+error rate stay healthy and cuts it multiplicatively when they degrade.
+
+Calls above a limit of one run on worker threads. The Fusion 360 API is
+only supported on the main thread, so controllers used with real Fusion
+objects should keep max_limit at 1; map() then calls everything on the
+calling thread.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AIMDController:
+    """Additive-increase/multiplicative-decrease limit on concurrent API calls"""
+
+    def __init__(self, name='api', initial_limit=2, min_limit=1, max_limit=16,
+                 increase_step=1, decrease_factor=0.5, window_size=16,
+                 latency_tolerance=1.5, error_threshold=0.1, max_history=256):
+        self.name = name
+        self.limit = max(min_limit, min(initial_limit, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.window_size = window_size
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.max_history = max_history
+
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self._window_latencies = []
+        self._window_errors = 0
+
+        # Best average latency seen so far, used as the healthy reference
+        self.baseline_latency = None
+        # Limit after each completed window, the most recent max_history kept
+        self.history = []
+        self.total_calls = 0
+        self.total_errors = 0
+
+    def _acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def _release(self, latency, failed):
+        with self._cond:
+            self.in_flight -= 1
+            self.total_calls += 1
+            self._window_latencies.append(latency)
+            if failed:
+                self.total_errors += 1
+                self._window_errors += 1
+            if len(self._window_latencies) >= self.window_size:
+                self._adjust_limit()
+            self._cond.notify_all()
+
+    def _adjust_limit(self):
+        """Raise or cut the limit based on the window that just completed"""
+        count = len(self._window_latencies)
+        avg_latency = sum(self._window_latencies) / count
+        error_rate = self._window_errors / count
+        self._window_latencies = []
+        self._window_errors = 0
+
+        if self.baseline_latency is None or avg_latency < self.baseline_latency:
+            self.baseline_latency = avg_latency
+
+        healthy = (error_rate <= self.error_threshold and
+                   avg_latency <= self.baseline_latency * self.latency_tolerance)
+
+        old_limit = self.limit
+        if healthy:
+            self.limit = min(self.max_limit, self.limit + self.increase_step)
+        else:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        self.history.append(self.limit)
+        if len(self.history) > self.max_history:
+            del self.history[0]
+
+        if self.limit != old_limit:
+            logger.debug('%s concurrency %d -> %d (latency %.3fs, baseline %.3fs, errors %.0f%%)',
+                         self.name, old_limit, self.limit, avg_latency,
+                         self.baseline_latency, error_rate * 100)
+
+    def call(self, func, *args):
+        """Call func(*args) once a slot is free, recording its latency and outcome"""
+        self._acquire()
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+            failed = False
+            return result
+        finally:
+            self._release(time.perf_counter() - start, failed)
+
+    def map(self, func, items):
+        """Call func on every item, keeping at most `limit` calls in flight
+
+        Returns a list of (result, error) tuples in the same order as items.
+        Errors are returned rather than raised so one failing call does not
+        abandon the rest of the batch. With max_limit 1 the calls are made
+        on the calling thread.
+        """
+        items = list(items)
+
+        def run(item):
+            try:
+                return self.call(func, item), None
+            except Exception as e:
+                return None, e
+
+        if len(items) <= 1 or self.max_limit <= 1:
+            return [run(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_limit, len(items))) as executor:
+            return list(executor.map(run, items))
+
+    def reset_stats(self):
+        """Reset the call counters and limit history but keep the learned limit"""
+        with self._cond:
+            self.history = []
+            self.total_calls = 0
+            self.total_errors = 0
+
+    def settled_limit(self, windows=8):
+        """Average limit over the most recent windows"""
+        recent = self.history[-windows:]
+        if not recent:
+            return self.limit
+        return sum(recent) / len(recent)
+
+    def log_settled_limit(self):
+        """Log the concurrency the controller has settled on"""
+        logger.info(self.get_summary())
+
+    def get_summary(self):
+        """Get a one-line summary of the controller state"""
+        if self.history:
+            low, high = min(self.history), max(self.history)
+        else:
+            low = high = self.limit
+        return (f'{self.name} concurrency: settled at {self.settled_limit():.1f} '
+                f'(range {low}-{high}), {self.total_calls} calls, {self.total_errors} errors')
@@ -0,0 +1,323 @@
+"""
+File name cleaning utilities for the Cloud File Renamer
+
+These helpers do not depend on the Fusion 360 API so they can be tested
+and benchmarked outside of Fusion (see test_utilities.py).
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+# Characters replaced when 'replace_special' is enabled (including quotes and slashes)
+SPECIAL_CHARS = '!@#$%^&*()+=[]{};:"|<>?,./\\`~\''
+
+# Characters highlighted in the file preview
+PROBLEMATIC_CHARS = ['"', "'", '/', '\\', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '+', '=', '[', ']', '{', '}', ';', ':', '|', '<', '>', '?', ',', '.', '`', '~', ' ']
+
+# Names Windows refuses to use, regardless of extension
+RESERVED_NAMES = {'CON', 'PRN', 'AUX', 'NUL'} | {f'COM{i}' for i in range(1, 10)} | {f'LPT{i}' for i in range(1, 10)}
+
+MAX_FILENAME_LENGTH = 255
+
+EMPTY_NAME_FALLBACK = 'unnamed_file'
+
+# Default number of cleaned names kept by the shared result cache
+DEFAULT_CACHE_SIZE = 10000
+
+DEFAULT_OPTIONS = {
+    'replace_spaces': True,
+    'replace_special': True,
+    'replace_unicode': True,
+    'to_lowercase': False,
+    'replacement_char': '_'
+}
+
+
+def _char_class(chars):
+    """Build a regex character class matching any of the given characters"""
+    return '[' + ''.join(re.escape(c) for c in sorted(set(chars))) + ']'
+
+
+class CompiledCleaner:
+    """Cleaning rules for one option set, with all regexes compiled once
+
+    Build one per scan through FileNameCleaner.compile() instead of calling
+    clean_filename() with raw options for every file.
+    """
+
+    def __init__(self, replace_spaces=True, replace_special=True, replace_unicode=True,
+                 to_lowercase=False, replacement_char='_'):
+        self.replace_spaces = bool(replace_spaces)
+        self.replace_special = bool(replace_special)
+        self.replace_unicode = bool(replace_unicode)
+        self.to_lowercase = bool(to_lowercase)
+        self.replacement_char = replacement_char or ''
+        self.key = (self.replace_spaces, self.replace_special, self.replace_unicode,
+                    self.to_lowercase, self.replacement_char)
+
+        rc = self.replacement_char
+        self._special_re = re.compile(_char_class(SPECIAL_CHARS)) if self.replace_special else None
+        self._collapse_re = re.compile(re.escape(rc) + '+') if rc else None
+        self._dirty_re = re.compile(self._build_dirty_pattern())
+        self._edge_chars = frozenset(rc)
+        # Runs that the collapse step would shorten
+        self._collapse_run = rc + rc[-1] if rc else None
+
+    def _build_dirty_pattern(self):
+        """Build a character class matching any character clean() would replace or drop"""
+        rc = self.replacement_char
+        bad_chars = set()
+        if self.replace_spaces:
+            bad_chars.add(' ')
+        if self.replace_special:
+            bad_chars.update(SPECIAL_CHARS)
+        if self.to_lowercase:
+            bad_chars.update('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+        # Replacing a character with itself changes nothing, unless lowercasing changes it first
+        if len(rc) == 1 and (not self.to_lowercase or rc == rc.lower()):
+            bad_chars.discard(rc)
+
+        pattern = ''.join(re.escape(c) for c in sorted(bad_chars))
+        if self.replace_unicode:
+            pattern += '\\x80-\\U0010ffff'
+        # An empty class never matches anything
+        return '[' + pattern + ']' if pattern else '(?!)'
+
+    def is_clean(self, filename):
+        """Return True if clean() would return the name unchanged
+
+        Compliant names are accepted with one regex search plus a few
+        constant-time checks, without building the cleaned name.
+        """
+        # Empty names fall back to EMPTY_NAME_FALLBACK, and strip() removes edge characters
+        if not filename or filename[0] in self._edge_chars or filename[-1] in self._edge_chars:
+            return False
+        if self._collapse_run and self._collapse_run in filename:
+            return False
+        if self._dirty_re.search(filename):
+            return False
+        # Non-ASCII case changes can't be expressed in the pattern above
+        if self.to_lowercase and not self.replace_unicode and not filename.isascii():
+            return filename == filename.lower()
+        return True
+
+    def clean(self, filename):
+        """Clean a filename by replacing special characters"""
+        # Ensure we don't have an empty filename
+        return self.clean_without_fallback(filename) or EMPTY_NAME_FALLBACK
+
+    def clean_without_fallback(self, filename):
+        """Clean a filename, returning '' where clean() would use EMPTY_NAME_FALLBACK"""
+        cleaned = filename
+        rc = self.replacement_char
+
+        # Convert to lowercase first if requested
+        if self.to_lowercase:
+            cleaned = cleaned.lower()
+
+        # Replace spaces
+        if self.replace_spaces:
+            cleaned = cleaned.replace(' ', rc)
+
+        # Replace special characters (including quotes and slashes)
+        if self._special_re:
+            cleaned = self._special_re.sub(rc, cleaned)
+
+        # Replace unicode characters (keep only ASCII)
+        if self.replace_unicode:
+            cleaned = cleaned.encode('ascii', 'ignore').decode('ascii')
+
+        # Clean up multiple consecutive replacement characters
+        if self._collapse_re:
+            cleaned = self._collapse_re.sub(rc, cleaned)
+
+        # Remove leading/trailing replacement characters
+        return cleaned.strip(rc)
+
+    def clean_if_dirty(self, filename, cache=None):
+        """Return the cleaned name, or None if the name is already clean
+
+        Dirty names are looked up in the cache, if one is given, before
+        running the full cleaner. A cache only pays off when names repeat
+        (e.g. across projects); for mostly unique names its bookkeeping
+        costs more than cleaning.
+        """
+        if self.is_clean(filename):
+            return None
+        cleaned = cache.clean(self, filename) if cache is not None else self.clean(filename)
+        return cleaned if cleaned != filename else None
+
+
+class CleanResultCache:
+    """Thread-safe LRU cache of cleaned names keyed on (name, option set)
+
+    Names such as 'Component 1' or 'Drawing (1)' repeat across every
+    project in a hub, so their cleaned form is computed once and reused.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clean(self, cleaner, filename):
+        """Return cleaner.clean(filename), using the cached result if available"""
+        key = (filename, cleaner.key)
+        with self._lock:
+            cleaned = self._entries.get(key)
+            if cleaned is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cleaned
+            self.misses += 1
+
+        # Cleaning is pure, so a concurrent duplicate computation is harmless
+        cleaned = cleaner.clean(filename)
+
+        with self._lock:
+            if self.max_size > 0:
+                self._entries[key] = cleaned
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return cleaned
+
+    def resize(self, max_size):
+        """Change the maximum number of entries, evicting the oldest if needed"""
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > max(max_size, 0):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def reset_stats(self):
+        """Reset the counters but keep the cached entries"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_summary(self):
+        """Get a one-line summary of the cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            hit_rate = (self.hits / lookups * 100) if lookups else 0
+            return (f'Name cache: {self.hits} hits, {self.misses} misses, '
+                    f'{self.evictions} evictions ({hit_rate:.0f}% hit rate, '
+                    f'{len(self._entries)}/{self.max_size} entries)')
+
+
+# Shared by every cleaner in the process so results carry across projects and scans
+clean_cache = CleanResultCache()
+
+
+class FileNameCleaner:
+    """Option-aware entry points for cleaning and checking file names"""
+
+    _compiled = {}
+
+    @staticmethod
+    def options_key(options=None):
+        """Normalize an options dict into a hashable key"""
+        merged = dict(DEFAULT_OPTIONS)
+        if options:
+            merged.update(options)
+        return (bool(merged['replace_spaces']), bool(merged['replace_special']),
+                bool(merged['replace_unicode']), bool(merged['to_lowercase']),
+                merged['replacement_char'] or '')
+
+    @staticmethod
+    def compile(options=None):
+        """Return the CompiledCleaner for an options dict, building it once per option set"""
+        key = FileNameCleaner.options_key(options)
+        cleaner = FileNameCleaner._compiled.get(key)
+        if cleaner is None:
+            cleaner = CompiledCleaner(*key)
+            FileNameCleaner._compiled[key] = cleaner
+        return cleaner
+
+    @staticmethod
+    def clean_filename(filename, options=None):
+        """Clean a filename using the given options (defaults if omitted)"""
+        return clean_cache.clean(FileNameCleaner.compile(options), filename)
+
+    @staticmethod
+    def is_clean(filename, options=None):
+        """Return True if the filename is already compliant with the options"""
+        return FileNameCleaner.compile(options).is_clean(filename)
+
+    @staticmethod
+    def has_special_characters(filename, options=None):
+        """Return True if cleaning would change the filename"""
+        return not FileNameCleaner.compile(options).is_clean(filename)
+
+    @staticmethod
+    def get_problematic_characters(filename):
+        """Return the set of problematic characters found in a filename"""
+        problems = {c for c in filename if c in PROBLEMATIC_CHARS}
+        problems.update(c for c in filename if not c.isascii())
+        return problems
+
+    @staticmethod
+    def validate_filename(filename):
+        """Check a filename for issues. Returns (is_valid, issues)"""
+        issues = []
+
+        if not filename or not filename.strip():
+            issues.append('Filename is empty')
+            return False, issues
+
+        if len(filename) > MAX_FILENAME_LENGTH:
+            issues.append(f'Filename is longer than {MAX_FILENAME_LENGTH} characters')
+
+        if filename.split('.')[0].upper() in RESERVED_NAMES:
+            issues.append('Filename is a reserved system name')
+
+        if filename != filename.strip() or filename.endswith('.'):
+            issues.append('Filename has leading/trailing spaces or trailing dots')
+
+        if FileNameCleaner.has_special_characters(filename):
+            issues.append('Filename contains special characters')
+
+        return not issues, issues
+
+
+class FileRenamePreview:
+    """Collects planned rename operations for review"""
+
+    def __init__(self):
+        self.operations = []
+
+    def add_rename_operation(self, original_name, new_name, file_type='file'):
+        """Add a planned rename operation"""
+        self.operations.append({
+            'original_name': original_name,
+            'new_name': new_name,
+            'file_type': file_type
+        })
+
+    def get_summary(self):
+        """Get a printable summary of the planned renames"""
+        if not self.operations:
+            return 'No files to rename'
+
+        lines = [f'{len(self.operations)} files to rename:']
+        for operation in self.operations:
+            lines.append(f"- [{operation['file_type']}] {operation['original_name']} -> {operation['new_name']}")
+        return '\n'.join(lines)
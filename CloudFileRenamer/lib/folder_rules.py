@@ -0,0 +1,110 @@
+"""
+Include/exclude glob rules on cloud folder paths
+
+Folder paths are matched segment by segment, with the project (root
+folder) as the first segment:
+
+    */Archive/**        any folder named Archive directly under a project, and everything below it
+    **/Obsolete         a folder named Obsolete anywhere
+    * > Imports > Vendor > **
+                        '>' may be used as the separator, as in the preview paths
+
+'*' and '?' match within one folder name, '**' matches any number of
+folders. Matching is case-insensitive. The rules are checked when a folder
+is entered, so excluded subtrees are never listed.
+"""
+
+import re
+from fnmatch import fnmatchcase
+
+def split_path(path):
+    """Split a 'A > B > C' or 'A/B/C' path into lowercase folder names"""
+    return [part.strip().lower() for part in re.split(r'\s*>\s*|/', path) if part.strip()]
+
+
+def parse_patterns(text):
+    """Parse comma, semicolon or newline separated patterns"""
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        return [pattern for pattern in text if pattern.strip()]
+    return [pattern.strip() for pattern in re.split(r'[,;\n]', text) if pattern.strip()]
+
+
+def _match_segments(pattern, parts, allow_prefix=False):
+    """Match path segments against pattern segments
+
+    With allow_prefix, also succeed when the path could still grow into a
+    match (used to decide whether to descend towards included folders).
+    """
+    if not parts:
+        return allow_prefix or all(segment == '**' for segment in pattern)
+    if not pattern:
+        return False
+
+    head = pattern[0]
+    if head == '**':
+        return (_match_segments(pattern[1:], parts, allow_prefix) or
+                _match_segments(pattern, parts[1:], allow_prefix))
+    return fnmatchcase(parts[0], head) and _match_segments(pattern[1:], parts[1:], allow_prefix)
+
+
+class FolderRules:
+    """Decides which folders a scan enters and which folders' files it reads"""
+
+    def __init__(self, include=None, exclude=None):
+        self.include = parse_patterns(include)
+        self.exclude = parse_patterns(exclude)
+        self._include_segments = [split_path(pattern) for pattern in self.include]
+        self._exclude_segments = [split_path(pattern) for pattern in self.exclude]
+        self.pruned_folders = 0
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    def is_excluded(self, path):
+        parts = split_path(path)
+        return any(_match_segments(pattern, parts) for pattern in self._exclude_segments)
+
+    def is_included(self, path):
+        """True if files in the folder should be scanned (ignoring excludes)"""
+        if not self._include_segments:
+            return True
+        parts = split_path(path)
+        return any(_match_segments(pattern, parts) for pattern in self._include_segments)
+
+    def may_contain_included(self, path):
+        """True if the folder or one of its subfolders could be included"""
+        if not self._include_segments:
+            return True
+        parts = split_path(path)
+        return any(_match_segments(pattern, parts, allow_prefix=True) for pattern in self._include_segments)
+
+    def folder_path(self, folder):
+        """Full path of a folder, using the cached path when available"""
+        path = getattr(folder, 'path', None)
+        if isinstance(path, str):
+            return path
+
+        path_parts = []
+        current_folder = folder
+        while current_folder:
+            path_parts.insert(0, current_folder.name)
+            current_folder = current_folder.parentFolder
+        return ' > '.join(path_parts)
+
+    def enter(self, folder):
+        """Return (descend, include_files) for a folder about to be scanned
+
+        Folders that are excluded, or that can't lead to an included folder,
+        are counted in pruned_folders and should not be listed at all.
+        """
+        path = self.folder_path(folder)
+        if self.is_excluded(path) or not self.may_contain_included(path):
+            self.pruned_folders += 1
+            return False, False
+        return True, self.is_included(path)
+
+    def get_summary(self):
+        """Get a one-line summary of the pruning"""
+        return f'Folder rules: {self.pruned_folders} folders pruned'
@@ -0,0 +1,129 @@
+"""
+What-if comparison of several rename option sets in one scan
+
+The folder tree is walked once. The names of each scanned folder are then
+run through every option set's compiled cleaner in memory, so comparing N
+option sets costs one traversal plus N cheap passes over the names.
+"""
+
+from collections import Counter
+
+from file_utils import DEFAULT_OPTIONS, EMPTY_NAME_FALLBACK, FileNameCleaner
+
+
+def describe_options(overrides):
+    """Short label for a dict of option overrides, such as: replacement_char '-', to_lowercase on"""
+    changes = []
+    for option, default in DEFAULT_OPTIONS.items():
+        if option not in overrides:
+            continue
+        value = overrides[option]
+        if isinstance(default, bool):
+            changes.append(f"{option} {'on' if value else 'off'}")
+        else:
+            changes.append(f"{option} '{value}'")
+    return ', '.join(changes) or 'no changes'
+
+
+def _name_key(name, extension):
+    # Names that only differ in case can't be told apart in a folder
+    return (name.casefold(), (extension or '').lower())
+
+
+class OptionStats:
+    """Outcome of one option set over the scanned files"""
+
+    def __init__(self, label, cleaner):
+        self.label = label
+        self.cleaner = cleaner
+        self.files_changed = 0
+        self.collisions = 0
+        self.empty_fallbacks = 0
+
+    def get_summary(self):
+        return (f'{self.label}: {self.files_changed} files renamed, '
+                f'{self.collisions} in new name collisions, '
+                f'{self.empty_fallbacks} named {EMPTY_NAME_FALLBACK}')
+
+
+class OptionComparison:
+    """Applies several option sets to every scanned folder and records where they disagree
+
+    The selected options are compared with each dict in overrides applied
+    on top of them. Overrides that give the same effective options as the
+    selection or an earlier override are compared once and listed in
+    skipped. Up to max_differences disagreeing files are kept for the
+    diff. Set partial when the scan did not cover its whole scope.
+    """
+
+    def __init__(self, selected_options, overrides, max_differences=1000):
+        self.stats = []
+        self.skipped = []
+        seen = set()
+        candidates = [('selected', selected_options)]
+        candidates += [(describe_options(override), dict(selected_options or {}, **override))
+                       for override in overrides]
+        for label, options in candidates:
+            key = FileNameCleaner.options_key(options)
+            if key in seen:
+                self.skipped.append(label)
+                continue
+            seen.add(key)
+            self.stats.append(OptionStats(label, FileNameCleaner.compile(options)))
+
+        self.max_differences = max_differences
+        self.differences = []
+        self.disagreements = 0
+        self.files_compared = 0
+        self.folders_compared = 0
+        self.partial = False
+
+    @property
+    def labels(self):
+        return [stats.label for stats in self.stats]
+
+    def add_folder(self, location, files):
+        """Compare the option sets on one folder's (name, extension) pairs"""
+        self.folders_compared += 1
+        self.files_compared += len(files)
+        original_counts = Counter(_name_key(name, extension) for name, extension in files)
+
+        results = []
+        for stats in self.stats:
+            new_names = [stats.cleaner.clean_if_dirty(name) or name for name, _ in files]
+            new_counts = Counter(_name_key(new_name, extension)
+                                 for new_name, (_, extension) in zip(new_names, files))
+
+            for new_name, (name, extension) in zip(new_names, files):
+                if new_name == name:
+                    continue
+                stats.files_changed += 1
+                # A file may really be called unnamed_file; only count names that cleaned to nothing
+                if new_name == EMPTY_NAME_FALLBACK and not stats.cleaner.clean_without_fallback(name):
+                    stats.empty_fallbacks += 1
+
+            # Files sharing a name with more files than before cleaning
+            for new_name, (name, extension) in zip(new_names, files):
+                if new_counts[_name_key(new_name, extension)] > original_counts[_name_key(name, extension)]:
+                    stats.collisions += 1
+
+            results.append(new_names)
+
+        for index, (name, _) in enumerate(files):
+            outcomes = [new_names[index] for new_names in results]
+            if len(set(outcomes)) > 1:
+                self.disagreements += 1
+                if len(self.differences) < self.max_differences:
+                    self.differences.append((location, name, outcomes))
+
+    def get_summary(self):
+        """Get a printable per-option summary"""
+        lines = [f'Compared {len(self.stats)} option sets on {self.files_compared} files '
+                 f'in {self.folders_compared} folders']
+        if self.partial:
+            lines.append('Partial comparison: only the folders scanned in this session')
+        lines.extend(stats.get_summary() for stats in self.stats)
+        if self.skipped:
+            lines.append(f'Skipped as the same as an earlier set: {"; ".join(self.skipped)}')
+        lines.append(f'The option sets disagree on {self.disagreements} files')
+        return '\n'.join(lines)
@@ -0,0 +1,156 @@
+"""
+Reference graph of rename candidates
+
+Uses the DataFile parent/child reference information to show how many
+files depend on each candidate before it is renamed, and to order renames
+leaf-first (referenced components before the assemblies that use them).
+"""
+
+from cloud_cache import materialize
+
+
+def fetch_references(data_file):
+    """Fetch (parent_files, child_files) for a DataFile as plain lists"""
+    parents = []
+    children = []
+    if getattr(data_file, 'hasParentReferences', True):
+        parents = materialize(data_file.parentReferences)
+    if getattr(data_file, 'hasChildReferences', True):
+        children = materialize(data_file.childReferences)
+    return parents, children
+
+
+class ReferenceGraph:
+    """Parent/child references between files, fetched once per file id
+
+    Lookups are made in batches through the API controller (if given).
+    Parents of candidates are followed up to max_depth levels so the
+    total number of affected files can be reported. Each file id is only
+    fetched once, so shared components are not looked up repeatedly.
+    """
+
+    def __init__(self, controller=None, batch_size=50, max_depth=5):
+        self.controller = controller
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.parents = {}
+        self.children = {}
+        self.names = {}
+        self.lookups = 0
+        self.failed_lookups = 0
+
+    def _fetch_batch(self, data_files):
+        if self.controller:
+            return self.controller.map(fetch_references, data_files)
+
+        results = []
+        for data_file in data_files:
+            try:
+                results.append((fetch_references(data_file), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def build(self, data_files):
+        """Fetch references for the candidates and their ancestors"""
+        level = {}
+        for data_file in data_files:
+            level.setdefault(data_file.id, data_file)
+
+        depth = 0
+        while level and depth <= self.max_depth:
+            pending = [(file_id, data_file) for file_id, data_file in level.items()
+                       if file_id not in self.parents]
+            next_level = {}
+
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                results = self._fetch_batch([data_file for _, data_file in batch])
+                self.lookups += len(batch)
+
+                for (file_id, _), (references, error) in zip(batch, results):
+                    if error is not None:
+                        self.failed_lookups += 1
+                        self.parents[file_id] = []
+                        self.children[file_id] = []
+                        continue
+
+                    parent_files, child_files = references
+                    self.parents[file_id] = self._record(parent_files)
+                    self.children[file_id] = self._record(child_files)
+                    for parent_id, parent_file in zip(self.parents[file_id], parent_files):
+                        if parent_id not in self.parents:
+                            next_level.setdefault(parent_id, parent_file)
+
+            level = next_level
+            depth += 1
+
+        return self
+
+    def _record(self, data_files):
+        ids = []
+        for data_file in data_files:
+            file_id = data_file.id
+            if file_id not in self.names:
+                self.names[file_id] = data_file.name
+            ids.append(file_id)
+        return ids
+
+    def inbound_count(self, file_id):
+        """Number of files that directly reference this file"""
+        return len(self.parents.get(file_id, ()))
+
+    def affected_count(self, file_id):
+        """Number of files that reference this file directly or indirectly"""
+        seen = set()
+        stack = list(self.parents.get(file_id, ()))
+        while stack:
+            parent_id = stack.pop()
+            if parent_id in seen or parent_id == file_id:
+                continue
+            seen.add(parent_id)
+            stack.extend(self.parents.get(parent_id, ()))
+        return len(seen)
+
+    def annotate(self, files_to_rename):
+        """Add 'inbound_references', 'affected_files' and 'referenced_by' to each file_info"""
+        for file_info in files_to_rename:
+            file_id = file_info['data_file'].id
+            file_info['inbound_references'] = self.inbound_count(file_id)
+            file_info['affected_files'] = self.affected_count(file_id)
+            file_info['referenced_by'] = [self.names[parent_id] for parent_id in self.parents.get(file_id, ())]
+        return files_to_rename
+
+    def leaf_first(self, files_to_rename):
+        """Order file_infos so files come after the candidates they reference
+
+        Keeps the original order where references don't constrain it. Files
+        in reference cycles keep their original relative order at the end.
+        """
+        ids = [file_info['data_file'].id for file_info in files_to_rename]
+        candidate_ids = set(ids)
+
+        # Referenced candidates each file has to wait for
+        waits_for = {}
+        for file_id in ids:
+            waits_for[file_id] = {child for child in self.children.get(file_id, ())
+                                  if child in candidate_ids and child != file_id}
+
+        ordered = []
+        done = set()
+        progress = True
+        while progress:
+            progress = False
+            for file_info, file_id in zip(files_to_rename, ids):
+                if file_id not in done and waits_for[file_id] <= done:
+                    ordered.append(file_info)
+                    done.add(file_id)
+                    progress = True
+
+        ordered.extend(file_info for file_info, file_id in zip(files_to_rename, ids) if file_id not in done)
+        return ordered
+
+    def get_summary(self):
+        """Get a one-line summary of the reference lookups"""
+        return (f'References: {len(self.parents)} files looked up in batches of {self.batch_size}, '
+                f'{self.failed_lookups} failed')
@@ -0,0 +1,170 @@
+"""
+Report and export helpers for the Cloud File Renamer
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+import zlib
+
+DRY_RUN_COLUMNS = ['folder_path', 'file_type', 'original_name', 'new_name',
+                   'inbound_references', 'affected_files', 'referenced_by']
+
+
+def write_dry_run_csv(file_path, files_to_rename):
+    """Write the planned renames to a CSV file without renaming anything"""
+    with open(file_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(DRY_RUN_COLUMNS)
+        for file_info in files_to_rename:
+            row = []
+            for column in DRY_RUN_COLUMNS:
+                value = file_info.get(column, '')
+                if isinstance(value, list):
+                    value = '; '.join(value)
+                row.append(value)
+            writer.writerow(row)
+    return len(files_to_rename)
+
+
+DUPLICATE_COLUMNS = ['cluster', 'cluster_size', 'name', 'location']
+
+
+def normalized_key(cleaner, name, extension=''):
+    """Key two files share when their names become ambiguous after cleaning
+
+    The cleaned name is case-folded, so names that only differ in case
+    after cleaning share a key. Files with different extensions don't.
+    """
+    cleaned = name if cleaner.is_clean(name) else cleaner.clean(name)
+    extension = (extension or '').lstrip('.').lower()
+    return f'{cleaned.casefold()}.{extension}' if extension else cleaned.casefold()
+
+
+class DuplicateNameReport:
+    """Groups scanned files by normalized name to find ambiguous clusters
+
+    Files are added one at a time as the scan streams them and grouped by
+    hashing their normalized key. Once more than max_in_memory files are
+    held, they are spilled to partition files on disk by key hash, so each
+    partition can later be grouped on its own and memory stays bounded by
+    the largest partition. Set partial when the scan that fed the report
+    did not cover its whole scope (e.g. it stopped on a time limit).
+    """
+
+    def __init__(self, cleaner, min_cluster_size=2, max_in_memory=200000, partitions=64, spill_dir=None):
+        self.cleaner = cleaner
+        self.min_cluster_size = min_cluster_size
+        self.max_in_memory = max_in_memory
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+
+        self._groups = {}
+        self._in_memory = 0
+        self._spill_path = None
+        self.files_added = 0
+        self.spills = 0
+        self.partial = False
+
+    def add(self, name, extension, location):
+        """Add one scanned file"""
+        key = normalized_key(self.cleaner, name, extension)
+        self._groups.setdefault(key, []).append((name, location))
+        self._in_memory += 1
+        self.files_added += 1
+        if self._in_memory >= self.max_in_memory:
+            self._spill()
+
+    def _partition_file(self, index, mode):
+        return open(os.path.join(self._spill_path, f'{index}.csv'), mode, newline='', encoding='utf-8')
+
+    def _spill(self):
+        """Append the in-memory groups to their partition files"""
+        if self._spill_path is None:
+            self._spill_path = tempfile.mkdtemp(prefix='renamer_duplicates_', dir=self.spill_dir)
+
+        by_partition = {}
+        for key, entries in self._groups.items():
+            by_partition.setdefault(zlib.crc32(key.encode('utf-8')) % self.partitions, []).append((key, entries))
+
+        for index, groups in by_partition.items():
+            with self._partition_file(index, 'a') as partition:
+                writer = csv.writer(partition)
+                for key, entries in groups:
+                    writer.writerows((key, name, location) for name, location in entries)
+
+        self._groups = {}
+        self._in_memory = 0
+        self.spills += 1
+
+    def clusters(self):
+        """Yield (key, [(name, location), ...]) for every cluster of at least min_cluster_size"""
+        if self._spill_path is None:
+            for key, entries in self._groups.items():
+                if len(entries) >= self.min_cluster_size:
+                    yield key, entries
+            return
+
+        if self._groups:
+            self._spill()
+        for index in range(self.partitions):
+            path = os.path.join(self._spill_path, f'{index}.csv')
+            if not os.path.exists(path):
+                continue
+            groups = {}
+            with self._partition_file(index, 'r') as partition:
+                for key, name, location in csv.reader(partition):
+                    groups.setdefault(key, []).append((name, location))
+            for key, entries in groups.items():
+                if len(entries) >= self.min_cluster_size:
+                    yield key, entries
+
+    def close(self):
+        """Remove any spill files"""
+        if self._spill_path is not None:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+        self._groups = {}
+        self._in_memory = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_summary(self):
+        """Get a one-line summary of the grouping"""
+        spilled = f', spilled to disk {self.spills} times' if self.spills else ''
+        partial = ' (partial: only the folders scanned in this session)' if self.partial else ''
+        return f'Duplicate names: {self.files_added} files grouped by normalized name{spilled}{partial}'
+
+
+def write_duplicate_report_csv(file_path, report):
+    """Write the clusters of a DuplicateNameReport to a CSV file
+
+    Clusters are written as they are grouped, so the whole report never
+    has to be held in memory. Returns the number of clusters written.
+    """
+    cluster_count = 0
+    with open(file_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(DUPLICATE_COLUMNS)
+        for key, entries in report.clusters():
+            writer.writerows([key, len(entries), name, location] for name, location in entries)
+            cluster_count += 1
+    return cluster_count
+
+
+def write_option_comparison_csv(file_path, comparison):
+    """Write the files an OptionComparison's option sets disagree on to a CSV file
+
+    Returns the number of files written.
+    """
+    with open(file_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['location', 'original_name'] + comparison.labels)
+        for location, name, outcomes in comparison.differences:
+            writer.writerow([location, name] + outcomes)
+    return len(comparison.differences)
@@ -0,0 +1,328 @@
+"""
+Sampling-based estimate of a scan before walking the whole tree
+
+Each probe walks from a project's root folder down a random path, listing
+one folder per level. Weighting each folder by the product of the
+branching factors above it gives an unbiased estimate of the total folder
+and file counts (Knuth's tree-size estimator). Averaging many probes gives
+the estimate, and their spread gives the confidence interval.
+"""
+
+import math
+import random
+import time
+
+from cloud_cache import materialize
+
+# 95% confidence intervals
+Z_SCORE = 1.96
+
+
+def _mean_and_error(values):
+    """Return (mean, standard error) of a list of values"""
+    count = len(values)
+    mean = sum(values) / count
+    if count < 2:
+        return mean, None
+    variance = sum((value - mean) ** 2 for value in values) / (count - 1)
+    return mean, math.sqrt(variance / count)
+
+
+def _sum_estimates(project_totals):
+    """Add up per-project (mean, error) estimates of a total"""
+    total = None
+    for mean, error in project_totals:
+        estimate = Estimate(mean, error)
+        total = estimate if total is None else total + estimate
+    return total
+
+
+def _extrapolate(project_means, project_count):
+    """Scale the mean of the sampled projects' totals up to all projects"""
+    if not project_means:
+        return None
+    mean, error = _mean_and_error(project_means)
+    return Estimate(mean * project_count, error * project_count if error is not None else None)
+
+
+class Estimate:
+    """A point estimate with an optional confidence interval"""
+
+    def __init__(self, value, error=None, minimum=0):
+        self.value = value
+        if error is None:
+            self.low = self.high = None
+        else:
+            self.low = max(minimum, value - Z_SCORE * error)
+            self.high = value + Z_SCORE * error
+
+    def __add__(self, other):
+        total = Estimate(self.value + other.value)
+        if self.low is not None and other.low is not None:
+            total.low = self.low + other.low
+            total.high = self.high + other.high
+        return total
+
+    def format(self, fmt='{:,.0f}'):
+        text = fmt.format(self.value)
+        if self.low is None:
+            return f'{text} (too few samples for a range)'
+        return f'{text} ({fmt.format(self.low)} - {fmt.format(self.high)})'
+
+
+def format_duration(seconds):
+    """Format seconds as a short human readable duration"""
+    if seconds < 90:
+        return f'{seconds:.0f}s'
+    if seconds < 90 * 60:
+        return f'{seconds / 60:.0f} min'
+    return f'{seconds / 3600:.1f} h'
+
+
+class ScanEstimator:
+    """Estimates file count, dirty ratio and scan/rename time from random probes
+
+    api_budget bounds the folder listings and name reads made while
+    sampling. Probes already started are finished, so the budget can be
+    exceeded by at most one probe's depth per sampled project. Projects
+    are sampled min_project_budget calls or more each; on hubs with more
+    projects than that allows, a random subset is sampled. Listings are
+    cached, so probes of a small project soon cost nothing; sampling a
+    project also stops after max_probes probes, or after max_free_probes
+    probes in a row that made no new API calls.
+    """
+
+    def __init__(self, cleaner, api_budget=200, names_per_folder=5, include_file=None,
+                 folder_rules=None, rename_seconds=None, seed=None, max_probes=500, max_free_probes=20,
+                 min_project_budget=30):
+        self.cleaner = cleaner
+        self.api_budget = api_budget
+        self.max_probes = max_probes
+        self.max_free_probes = max_free_probes
+        self.min_project_budget = min_project_budget
+        self.names_per_folder = names_per_folder
+        self.include_file = include_file
+        self.folder_rules = folder_rules
+        self.rename_seconds = rename_seconds
+        self.rng = random.Random(seed)
+
+        self.api_calls = 0
+        self.probes = 0
+        self._listings = {}
+        self._dirty = {}
+        self._listing_time = 0.0
+        self._listing_count = 0
+        self._name_time = 0.0
+        self._name_count = 0
+
+    def _admit(self, folder):
+        """Return (descend, include_files) for a folder, as the scan decides it"""
+        if not self.folder_rules:
+            return True, True
+        return self.folder_rules.enter(folder)
+
+    def _list(self, folder):
+        """Files and admitted (subfolder, include_files) pairs of a folder, listed once"""
+        key = id(folder)
+        if key not in self._listings:
+            start = time.perf_counter()
+            files = materialize(folder.dataFiles)
+            sub_folders = materialize(folder.dataFolders)
+            self._listing_time += time.perf_counter() - start
+            self._listing_count += 1
+            self.api_calls += 2
+
+            admitted = [(sub, self._admit(sub)) for sub in sub_folders]
+            sub_folders = [(sub, include_files) for sub, (descend, include_files) in admitted if descend]
+            self._listings[key] = (folder, files, sub_folders)
+        return self._listings[key][1:]
+
+    def _is_dirty(self, data_file):
+        key = id(data_file)
+        if key not in self._dirty:
+            start = time.perf_counter()
+            dirty = ((self.include_file is None or self.include_file(data_file)) and
+                     bool(self.cleaner.clean_if_dirty(data_file.name)))
+            self._name_time += time.perf_counter() - start
+            self._name_count += 1
+            self.api_calls += 1
+            self._dirty[key] = dirty
+        return self._dirty[key]
+
+    def _probe(self, root_folder, include_files=True):
+        """One random root-to-leaf walk. Returns (folders, files, dirty_files) estimates
+
+        Files only count in folders whose files the folder rules include.
+        """
+        weight = 1
+        folders = files = dirty = 0.0
+        folder = root_folder
+
+        while folder is not None:
+            data_files, sub_folders = self._list(folder)
+            folders += weight
+            if not include_files:
+                data_files = []
+            files += weight * len(data_files)
+
+            if data_files:
+                sample = self.rng.sample(data_files, min(self.names_per_folder, len(data_files)))
+                dirty_fraction = sum(self._is_dirty(f) for f in sample) / len(sample)
+                dirty += weight * len(data_files) * dirty_fraction
+
+            if not sub_folders:
+                break
+            weight *= len(sub_folders)
+            folder, include_files = self.rng.choice(sub_folders)
+
+        return folders, files, dirty
+
+    def _sample_project(self, root_folder, budget):
+        """Probe one project until its share of the budget is spent. Returns the samples"""
+        start_calls = self.api_calls
+        samples = []
+        free_probes = 0
+        try:
+            descend, include_files = self._admit(root_folder)
+            if not descend:
+                # The scan never lists a pruned project
+                return [(0.0, 0.0, 0.0)]
+            while not samples or (self.api_calls - start_calls < budget and
+                                  len(samples) < self.max_probes and
+                                  free_probes < self.max_free_probes):
+                probe_calls = self.api_calls
+                samples.append(self._probe(root_folder, include_files))
+                self.probes += 1
+                free_probes = free_probes + 1 if self.api_calls == probe_calls else 0
+        except Exception:
+            pass
+        return samples
+
+    def estimate(self, root_folders):
+        """Sample the root folders (one per project) within the shared budget
+
+        Each sampled project gets at least min_project_budget calls. When
+        the budget can't cover every project, a random subset is sampled
+        and its totals are extrapolated to all projects, with the spread
+        between the sampled projects in the confidence interval.
+        """
+        root_folders = list(root_folders)
+        project_count = len(root_folders)
+        sample_size = min(project_count, max(1, int(self.api_budget // self.min_project_budget)))
+        if sample_size < project_count:
+            root_folders = self.rng.sample(root_folders, sample_size)
+        project_budget = self.api_budget / max(1, sample_size)
+
+        project_samples = []
+        for root_folder in root_folders:
+            if self.api_calls >= self.api_budget:
+                break
+            samples = self._sample_project(root_folder, project_budget)
+            if samples:
+                project_samples.append(samples)
+
+        totals = []
+        for column in range(3):
+            project_totals = [_mean_and_error([s[column] for s in samples]) for samples in project_samples]
+            if len(project_samples) == project_count:
+                totals.append(_sum_estimates(project_totals))
+            else:
+                totals.append(_extrapolate([mean for mean, _ in project_totals], project_count))
+
+        return ScanEstimate(self, *totals, project_samples, project_count)
+
+    @property
+    def seconds_per_listing(self):
+        return self._listing_time / self._listing_count if self._listing_count else 0.0
+
+    @property
+    def seconds_per_name(self):
+        return self._name_time / self._name_count if self._name_count else 0.0
+
+
+class ScanEstimate:
+    """Result of a ScanEstimator run"""
+
+    def __init__(self, estimator, folders, files, dirty_files, project_samples, project_count):
+        self.projects = len(project_samples)
+        self.project_count = project_count
+        self.probes = estimator.probes
+        self.api_calls = estimator.api_calls
+        self.folders = folders or Estimate(0)
+        self.files = files or Estimate(0)
+        self.dirty_files = dirty_files or Estimate(0)
+        self.dirty_ratio = self._ratio_estimate(project_samples, project_count)
+
+        # Scan time: one listing per folder plus one name read per file
+        listing = estimator.seconds_per_listing
+        per_name = estimator.seconds_per_name
+        self.scan_seconds = self._combine(self.folders, self.files, lambda f, n: f * listing + n * per_name)
+
+        # Renames are assumed to cost about as much as a folder listing unless told otherwise
+        per_rename = estimator.rename_seconds if estimator.rename_seconds is not None else listing
+        self.rename_seconds = self._combine(self.dirty_files, self.dirty_files, lambda d, _: d * per_rename)
+
+    @staticmethod
+    def _combine(first, second, func):
+        combined = Estimate(func(first.value, second.value))
+        if first.low is not None and second.low is not None:
+            combined.low = func(first.low, second.low)
+            combined.high = func(first.high, second.high)
+        return combined
+
+    @staticmethod
+    def _ratio_estimate(project_samples, project_count):
+        """Dirty ratio with a linearized (ratio estimator) confidence interval"""
+        project_files = [sum(s[1] for s in samples) / len(samples) for samples in project_samples]
+        project_dirty = [sum(s[2] for s in samples) / len(samples) for samples in project_samples]
+        files = sum(project_files)
+        if not files:
+            return Estimate(0.0)
+
+        ratio = sum(project_dirty) / files
+        if len(project_samples) < project_count:
+            # Only some projects were sampled, so the spread between them sets the interval
+            residuals = [dirty - ratio * file_count for dirty, file_count in zip(project_dirty, project_files)]
+            _, error = _mean_and_error(residuals)
+            if error is None:
+                return Estimate(ratio)
+            estimate = Estimate(ratio, error / (files / len(project_samples)))
+            estimate.high = min(1.0, estimate.high)
+            return estimate
+
+        variance = 0.0
+        for samples in project_samples:
+            if len(samples) < 2:
+                return Estimate(ratio)
+            residuals = [s[2] - ratio * s[1] for s in samples]
+            mean = sum(residuals) / len(residuals)
+            variance += sum((r - mean) ** 2 for r in residuals) / (len(residuals) - 1) / len(samples)
+
+        estimate = Estimate(ratio, math.sqrt(variance) / files)
+        estimate.high = min(1.0, estimate.high)
+        return estimate
+
+    def get_summary(self):
+        """Get a printable summary of the estimate"""
+        lines = [
+            f'Sampled {self.probes} folder paths in {self._format_projects()} ({self.api_calls} API calls)',
+            f'Files: {self.files.format()}',
+            f'Folders: {self.folders.format()}',
+            f'Files to rename: {self.dirty_files.format()}',
+            f'Dirty ratio: {self.dirty_ratio.format("{:.1%}")}',
+            f'Scan time: {self._format_time(self.scan_seconds)}',
+            f'Rename time: {self._format_time(self.rename_seconds)}',
+        ]
+        return '\n'.join(lines)
+
+    def _format_projects(self):
+        if self.projects < self.project_count:
+            return f'{self.projects} of {self.project_count} projects, extrapolated to all'
+        return f'{self.projects} projects'
+
+    @staticmethod
+    def _format_time(estimate):
+        text = format_duration(estimate.value)
+        if estimate.low is None:
+            return text
+        return f'{text} ({format_duration(estimate.low)} - {format_duration(estimate.high)})'
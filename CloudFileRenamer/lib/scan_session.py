@@ -0,0 +1,247 @@
+"""
+Resumable, budgeted scanning with continuation tokens
+
+A ScanSession walks a list of scan roots (a project, or a folder inside
+a project) with an explicit stack of pending folders. It stops when a
+time or API-call budget runs out, and its state can be saved as a JSON
+continuation token and resumed in a later session.
+
+Folders are identified in the token by the chain of folder ids from the
+project's root folder, so they can be found again without holding on to
+API objects.
+"""
+
+import json
+import time
+
+from cloud_scan import fetch_all_contents
+
+TOKEN_VERSION = 1
+
+STOP_REASONS = {
+    'time_budget': 'stopped at its time limit',
+    'call_budget': 'stopped at its API call limit',
+    'error': 'stopped by an error',
+}
+
+
+def resolve_chain(root_folder, chain):
+    """Follow a chain of folder ids down from a root folder
+
+    Returns None if a folder on the way no longer exists (e.g. it was
+    moved or deleted since the token was saved).
+    """
+    folder = root_folder
+    for folder_id in chain:
+        folder = next((sub for sub in folder.dataFolders if sub.id == folder_id), None)
+        if folder is None:
+            return None
+    return folder
+
+
+class ScanSession:
+    """Depth-first scan of several roots that can stop and resume
+
+    roots is a list of (project_id, chain) pairs, where chain is the list
+    of folder ids from the project's root folder down to the folder to
+    scan ([] for the whole project). root_for_project(project_id) returns
+    the project's root folder.
+    """
+
+    def __init__(self, roots, root_for_project, controller=None, folder_rules=None):
+        self.roots = [(project_id, list(chain)) for project_id, chain in roots]
+        self.root_for_project = root_for_project
+        self.controller = controller
+        self.folder_rules = folder_rules
+
+        # Index of the root being scanned, and its pending folders (None until started)
+        self.cursor = 0
+        self.pending = None
+
+        self._root_folders = {}
+
+        self.api_calls = 0
+        self.folders_scanned = 0
+        self.skipped_folders = 0
+
+        # Why the last run stopped before finishing: 'time_budget', 'call_budget' or 'error'
+        self.stop_reason = None
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.cursor >= len(self.roots)
+
+    def _resolve(self, chain):
+        """Find a folder of the current root's project by its id chain"""
+        project_id, _ = self.roots[self.cursor]
+        if project_id not in self._root_folders:
+            self._root_folders[project_id] = self.root_for_project(project_id)
+        root_folder = self._root_folders[project_id]
+        return resolve_chain(root_folder, chain) if root_folder is not None else None
+
+    def _start_root(self):
+        """Resolve the current root folder and put it on the stack if the folder rules admit it"""
+        _, chain = self.roots[self.cursor]
+        folder = self._resolve(chain)
+        if folder is None:
+            self.skipped_folders += 1
+            self.pending = []
+            return
+
+        descend, include_files = self._admit(folder)
+        self.pending = [(chain, folder, include_files)] if descend else []
+
+    def _admit(self, folder):
+        if not self.folder_rules:
+            return True, True
+        return self.folder_rules.enter(folder)
+
+    def _next_batch(self, size):
+        """Pop up to size pending folders, resolving any loaded from a token
+
+        Folders are resolved before they are popped, so an API error
+        leaves them on the stack for the next attempt.
+        """
+        batch = []
+        while self.pending and len(batch) < size:
+            chain, folder, include_files = self.pending[-1]
+            if folder is None:
+                folder = self._resolve(chain)
+            self.pending.pop()
+            if folder is None:
+                self.skipped_folders += 1
+                continue
+            batch.append((chain, folder, include_files))
+        return batch
+
+    def run(self, visit, time_budget=None, call_budget=None):
+        """Scan until finished or a budget runs out. Returns True if finished
+
+        visit(folder, data_files) is called for every scanned folder.
+        time_budget is in seconds, call_budget in API calls (folder
+        listings count as two calls, cached folders as none). The folder
+        being scanned when a budget runs out is always completed.
+
+        Folders whose listing still fails after retries stay on the stack
+        and the run stops with stop_reason 'error', so the token retries
+        them. If visit raises, the folders it had not finished are put back
+        before the error is raised.
+        """
+        start_time = time.monotonic()
+        start_calls = self.api_calls
+        self.stop_reason = None
+        self.error = None
+
+        def budget_left():
+            if time_budget is not None and time.monotonic() - start_time >= time_budget:
+                self.stop_reason = 'time_budget'
+                return False
+            if call_budget is not None and self.api_calls - start_calls >= call_budget:
+                self.stop_reason = 'call_budget'
+                return False
+            return True
+
+        try:
+            return self._scan(visit, budget_left)
+        except Exception as e:
+            self.stop_reason = 'error'
+            self.error = e
+            raise
+
+    def _scan(self, visit, budget_left):
+        """The scan loop of run()"""
+        while not self.finished and budget_left():
+            if self.pending is None:
+                self._start_root()
+
+            if not self.pending:
+                self.cursor += 1
+                self.pending = None
+                continue
+
+            # List sibling folders together so the controller can overlap them
+            batch_size = max(1, int(self.controller.limit)) if self.controller else 1
+            batch = self._next_batch(batch_size)
+            if not batch:
+                continue
+
+            for _, folder, _ in batch:
+                if not getattr(folder, 'is_listed', False):
+                    self.api_calls += 2
+            listed = fetch_all_contents([folder for _, folder, _ in batch], self.controller, retries=2)
+
+            children = []
+            failed = []
+            for index, (entry, (contents, error)) in enumerate(zip(batch, listed)):
+                chain, folder, include_files = entry
+                if error is not None:
+                    failed.append(entry)
+                    self.error = error
+                    continue
+
+                try:
+                    data_files, sub_folders = contents
+                    visit(folder, data_files if include_files else [])
+
+                    folder_children = []
+                    for sub_folder in sub_folders:
+                        descend, sub_include_files = self._admit(sub_folder)
+                        if descend:
+                            folder_children.append((chain + [sub_folder.id], sub_folder, sub_include_files))
+                except Exception:
+                    # Put back this folder and the rest of the batch, above the children found so far
+                    self.pending.extend(reversed(children))
+                    self.pending.extend(reversed(failed + batch[index:]))
+                    raise
+
+                self.folders_scanned += 1
+                children.extend(folder_children)
+
+            # Push in reverse so the first subfolder is scanned first
+            self.pending.extend(reversed(children))
+
+            if failed:
+                # Keep folders that still can't be listed for the next session
+                self.pending.extend(reversed(failed))
+                self.stop_reason = 'error'
+                return False
+
+        return self.finished
+
+    def to_token(self):
+        """Serialize the remaining work as a JSON continuation token"""
+        pending = None
+        if self.pending is not None:
+            pending = [{'chain': chain, 'include_files': include_files}
+                       for chain, _, include_files in self.pending]
+        return json.dumps({
+            'version': TOKEN_VERSION,
+            'roots': [[project_id, chain] for project_id, chain in self.roots],
+            'cursor': self.cursor,
+            'pending': pending,
+        })
+
+    @classmethod
+    def from_token(cls, token, root_for_project, controller=None, folder_rules=None):
+        """Recreate a session from a continuation token"""
+        state = json.loads(token)
+        if state.get('version') != TOKEN_VERSION:
+            raise ValueError('Unsupported continuation token version')
+
+        session = cls(state['roots'], root_for_project, controller, folder_rules)
+        session.cursor = state['cursor']
+        if state['pending'] is not None:
+            session.pending = [(entry['chain'], None, entry['include_files'])
+                               for entry in state['pending']]
+        return session
+
+    def get_summary(self):
+        """Get a one-line summary of the session progress"""
+        if self.finished:
+            status = 'complete'
+        else:
+            reason = STOP_REASONS.get(self.stop_reason, 'stopped')
+            status = f'{reason} at scope {self.cursor + 1} of {len(self.roots)}'
+        return (f'Scan {status}: {self.folders_scanned} folders scanned, '
+                f'{self.api_calls} API calls, {self.skipped_folders} folders skipped')
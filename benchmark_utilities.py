@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for File Renamer utilities
+
+Measures the scan-time helpers independently of Fusion 360.
+"""
+
+import sys
+import os
+import random
+import time
+
+# Add the lib directory to path for benchmarking
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'CloudFileRenamer', 'lib'))
+
+from file_utils import FileNameCleaner, CleanResultCache
+from concurrency import AIMDController
+from cloud_scan import walk_folder_tree
+from cloud_cache import wrap_folder
+from fake_cloud_api import FakeCloudApi, build_fake_hub
+
+CLEAN_NAMES = ["Component_1", "Bracket_v2", "Main_Assembly", "Drawing_1", "Housing_Top", "Shaft_20mm"]
+DIRTY_NAMES = ["Component 1", "Drawing (1)", "Copy of Bracket v2", "Housing#Top", "测试文件", "Shaft 20mm!"]
+
+
+def make_names(count, dirty_ratio, seed=0):
+    """Build a list of names with the given fraction of dirty names"""
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        pool = DIRTY_NAMES if rng.random() < dirty_ratio else CLEAN_NAMES
+        names.append(f'{rng.choice(pool)}_{i}')
+    return names
+
+
+def time_call(func, repeat=5):
+    """Return the best wall-clock time of several runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_clean_fast_path():
+    """Compare always-clean scanning with the already-clean fast path"""
+    print("Clean Name Fast Path")
+    print("=" * 50)
+
+    cleaner = FileNameCleaner.compile()
+    count = 200000
+
+    def full_clean(names):
+        return [name for name in names if cleaner.clean(name) != name]
+
+    def fast_path(names):
+        return [name for name in names if cleaner.clean_if_dirty(name)]
+
+    print(f"{'dirty %':>8} {'full clean (ms)':>16} {'fast path (ms)':>15} {'speedup':>8}")
+    for dirty_ratio in (0.0, 0.01, 0.05, 0.25, 0.5, 1.0):
+        names = make_names(count, dirty_ratio)
+        assert full_clean(names) == fast_path(names)
+        full_time = time_call(lambda: full_clean(names))
+        fast_time = time_call(lambda: fast_path(names))
+        print(f"{dirty_ratio * 100:>7.0f}% {full_time * 1000:>16.1f} {fast_time * 1000:>15.1f} {full_time / fast_time:>7.1f}x")
+
+
+def benchmark_clean_result_cache():
+    """Compare cleaning repeated dirty names with and without the LRU cache"""
+    print("\nClean Result Cache")
+    print("=" * 50)
+
+    cleaner = FileNameCleaner.compile()
+    # A small set of common names repeated across many projects
+    rng = random.Random(1)
+    names = [rng.choice(DIRTY_NAMES) + f' ({rng.randint(1, 50)})' for _ in range(200000)]
+
+    print(f"{'cache size':>10} {'time (ms)':>10}  counters")
+    uncached_time = time_call(lambda: [cleaner.clean(name) for name in names], repeat=3)
+    print(f"{'none':>10} {uncached_time * 1000:>10.1f}")
+    for max_size in (10, 100, 1000):
+        cache = CleanResultCache(max_size=max_size)
+        cached_time = time_call(lambda: [cache.clean(cleaner, name) for name in names], repeat=1)
+        print(f"{max_size:>10} {cached_time * 1000:>10.1f}  {cache.get_summary()}")
+
+
+def benchmark_aimd_concurrency():
+    """Compare sequential, fixed and adaptive concurrency against a fake API"""
+    print("\nAIMD Concurrency Controller")
+    print("=" * 50)
+    print("Fake service: 5 ms per call, slows down and fails 30% of calls beyond 6 concurrent calls")
+
+    print(f"{'mode':>12} {'time (s)':>9} {'calls':>6} {'errors':>7}  controller")
+    modes = [
+        ('sequential', None),
+        ('fixed 32', dict(initial_limit=32, min_limit=32, max_limit=32)),
+        ('adaptive', dict(initial_limit=2, max_limit=32)),
+    ]
+    for label, settings in modes:
+        api = FakeCloudApi(latency=0.005, capacity=6, overload_error_rate=0.3)
+        hub = build_fake_hub(api, depth=2, folders_per_folder=16, files_per_folder=2)
+        controller = AIMDController(label, **settings) if settings else None
+
+        start = time.perf_counter()
+        for _ in walk_folder_tree(hub.projects[0].rootFolder, controller):
+            pass
+        elapsed = time.perf_counter() - start
+
+        summary = controller.get_summary() if controller else ''
+        print(f"{label:>12} {elapsed:>9.2f} {api.remote_calls:>6} {api.errors:>7}  {summary}")
+
+
+def scan_like_command(root_folder):
+    """Read the same properties per file as CloudFileRenamerCommandExecute's scanner"""
+    cleaner = FileNameCleaner.compile()
+    found = 0
+    for folder, data_files in walk_folder_tree(root_folder):
+        for data_file in data_files:
+            # should_include_file / get_file_type_description
+            extension = data_file.fileExtension.lower()
+            if extension not in ('f3d', 'f2d') and 'simulation' in data_file.name.lower():
+                continue
+            data_file.fileExtension.lower()
+            if cleaner.clean_if_dirty(data_file.name):
+                # get_folder_path
+                if hasattr(folder, 'path'):
+                    folder.path
+                else:
+                    current = folder
+                    while current:
+                        current.name
+                        current = current.parentFolder
+                found += 1
+    return found
+
+
+def benchmark_cached_folder_adapter():
+    """Compare API property accesses per file with and without cached folders"""
+    print("\nCached Folder Adapter")
+    print("=" * 50)
+
+    print(f"{'dirty %':>8} {'files':>7} {'raw access/file':>16} {'cached access/file':>19}")
+    for dirty_ratio in (0.05, 0.5, 1.0):
+        results = []
+        for wrap in (False, True):
+            api = FakeCloudApi()
+            hub = build_fake_hub(api, depth=4, folders_per_folder=3, files_per_folder=20,
+                                 dirty_ratio=dirty_ratio)
+            root = hub.projects[0].rootFolder
+            file_count = sum(len(files) for _, files in walk_folder_tree(root))
+            api.reset_counters()
+            scan_like_command(wrap_folder(root) if wrap else root)
+            results.append(api.property_accesses / file_count)
+        print(f"{dirty_ratio * 100:>7.0f}% {file_count:>7} {results[0]:>16.2f} {results[1]:>19.2f}")
+
+
+def main():
+    """Run all benchmarks"""
+    print("Fusion 360 File Renamer - Utility Benchmarks")
+    print("============================================")
+
+    benchmark_clean_fast_path()
+    benchmark_clean_result_cache()
+    benchmark_aimd_concurrency()
+    benchmark_cached_folder_adapter()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
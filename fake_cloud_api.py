@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Fake Fusion 360 data API for tests and benchmarks
+
+Mimics the DataHub/DataProject/DataFolder/DataFile objects used by the
+Cloud File Renamer. Every property access is counted, and folder listings
+and renames can be given latency and overload errors.
+"""
+
+import random
+import threading
+import time
+
+
+class FakeApiError(Exception):
+    """Raised when the fake service is overloaded"""
+
+
+class FakeCloudApi:
+    """Shared counters and latency model for one fake hub"""
+
+    def __init__(self, latency=0.0, capacity=None, overload_error_rate=0.0, seed=0):
+        # Seconds per remote call while the service is within capacity
+        self.latency = latency
+        # Concurrent remote calls the service handles before slowing down
+        self.capacity = capacity
+        # Chance that a remote call fails while the service is over capacity
+        self.overload_error_rate = overload_error_rate
+        self.property_accesses = 0
+        self.remote_calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._next_id = 0
+
+    def new_id(self):
+        self._next_id += 1
+        return f'urn:fake:{self._next_id}'
+
+    def access(self):
+        """Count a property access on a fake API object"""
+        with self._lock:
+            self.property_accesses += 1
+
+    def remote_call(self):
+        """Simulate a round trip to the data service"""
+        with self._lock:
+            self.property_accesses += 1
+            self.remote_calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            overload = self.in_flight / self.capacity if self.capacity else 1
+            fail = overload > 1 and self._rng.random() < self.overload_error_rate
+        try:
+            if self.latency:
+                time.sleep(self.latency * max(1, overload))
+            if fail:
+                with self._lock:
+                    self.errors += 1
+                raise FakeApiError('Service overloaded')
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def reset_counters(self):
+        self.property_accesses = 0
+        self.remote_calls = 0
+        self.errors = 0
+        self.max_in_flight = 0
+
+
+class FakeCollection:
+    """Mimics adsk.core collections (count/item/asArray)"""
+
+    def __init__(self, api, items):
+        self._api = api
+        self._items = items
+
+    @property
+    def count(self):
+        self._api.access()
+        return len(self._items)
+
+    def item(self, index):
+        self._api.access()
+        return self._items[index]
+
+    def asArray(self):
+        self._api.access()
+        return list(self._items)
+
+
+class FakeDataFile:
+    def __init__(self, api, name, extension, folder):
+        self._api = api
+        self._name = name
+        self._extension = extension
+        self._folder = folder
+        self._id = api.new_id()
+        self.parents = []
+        self.children = []
+
+    @property
+    def name(self):
+        self._api.access()
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._api.remote_call()
+        self._name = value
+
+    @property
+    def fileExtension(self):
+        self._api.access()
+        return self._extension
+
+    @property
+    def id(self):
+        self._api.access()
+        return self._id
+
+    @property
+    def parentFolder(self):
+        self._api.access()
+        return self._folder
+
+    @property
+    def parentProject(self):
+        self._api.access()
+        return self._folder._project
+
+    @property
+    def hasParentReferences(self):
+        self._api.access()
+        return bool(self.parents)
+
+    @property
+    def hasChildReferences(self):
+        self._api.access()
+        return bool(self.children)
+
+    @property
+    def parentReferences(self):
+        self._api.remote_call()
+        return FakeCollection(self._api, list(self.parents))
+
+    @property
+    def childReferences(self):
+        self._api.remote_call()
+        return FakeCollection(self._api, list(self.children))
+
+    def add_reference(self, child):
+        """Make this file reference (e.g. insert) the child file"""
+        self.children.append(child)
+        child.parents.append(self)
+
+
+class FakeDataFolder:
+    def __init__(self, api, name, parent, project):
+        self._api = api
+        self._name = name
+        self._parent = parent
+        self._project = project
+        self._id = api.new_id()
+        self.files = []
+        self.folders = []
+
+    @property
+    def name(self):
+        self._api.access()
+        return self._name
+
+    @property
+    def id(self):
+        self._api.access()
+        return self._id
+
+    @property
+    def parentFolder(self):
+        self._api.access()
+        return self._parent
+
+    @property
+    def parentProject(self):
+        self._api.access()
+        return self._project
+
+    @property
+    def dataFiles(self):
+        self._api.remote_call()
+        return FakeCollection(self._api, list(self.files))
+
+    @property
+    def dataFolders(self):
+        self._api.remote_call()
+        return FakeCollection(self._api, list(self.folders))
+
+    def add_folder(self, name):
+        folder = FakeDataFolder(self._api, name, self, self._project)
+        self.folders.append(folder)
+        return folder
+
+    def add_file(self, name, extension='f3d'):
+        data_file = FakeDataFile(self._api, name, extension, self)
+        self.files.append(data_file)
+        return data_file
+
+
+class FakeDataProject:
+    def __init__(self, api, name):
+        self._api = api
+        self._name = name
+        self._id = api.new_id()
+        self._root = FakeDataFolder(api, name, None, self)
+
+    @property
+    def name(self):
+        self._api.access()
+        return self._name
+
+    @property
+    def id(self):
+        self._api.access()
+        return self._id
+
+    @property
+    def rootFolder(self):
+        self._api.access()
+        return self._root
+
+
+class FakeDataHub:
+    def __init__(self, api, name='Fake Hub'):
+        self._api = api
+        self._name = name
+        self.projects = []
+
+    @property
+    def name(self):
+        self._api.access()
+        return self._name
+
+    @property
+    def dataProjects(self):
+        self._api.remote_call()
+        return FakeCollection(self._api, list(self.projects))
+
+    def add_project(self, name):
+        project = FakeDataProject(self._api, name)
+        self.projects.append(project)
+        return project
+
+
+CLEAN_NAMES = ["Component_1", "Bracket_v2", "Main_Assembly", "Drawing_1", "Housing_Top", "Shaft_20mm"]
+DIRTY_NAMES = ["Component 1", "Drawing (1)", "Copy of Bracket v2", "Housing#Top", "测试文件", "Shaft 20mm!"]
+EXTENSIONS = ['f3d', 'f3d', 'f3d', 'f2d', 'step', 'pdf']
+
+
+def build_fake_hub(api, projects=1, depth=2, folders_per_folder=3, files_per_folder=10,
+                   dirty_ratio=0.05, seed=0):
+    """Build a hub with the same folder tree in every project"""
+    rng = random.Random(seed)
+    hub = FakeDataHub(api)
+
+    def fill(folder, level):
+        for i in range(files_per_folder):
+            pool = DIRTY_NAMES if rng.random() < dirty_ratio else CLEAN_NAMES
+            folder.add_file(f'{rng.choice(pool)}_{i}', rng.choice(EXTENSIONS))
+        if level < depth:
+            for i in range(folders_per_folder):
+                fill(folder.add_folder(f'Folder_{level}_{i}'), level + 1)
+
+    for p in range(projects):
+        project = hub.add_project(f'Project_{p}')
+        fill(project.rootFolder, 0)
+
+    api.reset_counters()
+    return hub
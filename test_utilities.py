@@ -10,9 +10,20 @@ import sys
 import os
 
 # Add the lib directory to path for testing
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'FileRenamer', 'lib'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'CloudFileRenamer', 'lib'))
 
-from file_utils import FileNameCleaner, FileRenamePreview
+from file_utils import FileNameCleaner, FileRenamePreview, CleanResultCache
+from concurrency import AIMDController
+from cloud_scan import walk_folder_tree, rename_files
+from cloud_cache import wrap_folder, materialize
+from folder_rules import FolderRules
+from reference_graph import ReferenceGraph
+from reports import write_dry_run_csv, DuplicateNameReport, write_duplicate_report_csv, write_option_comparison_csv
+from scan_estimate import ScanEstimator
+from cloud_index import CloudIndex
+from scan_session import ScanSession
+from option_compare import OptionComparison
+from fake_cloud_api import FakeCloudApi, FakeDataHub, build_fake_hub
 
 def test_filename_cleaning():
     """Test various filename cleaning scenarios"""
@@ -101,6 +112,593 @@ def test_edge_cases():
             print(f"Issues:      {issues}")
         print("-" * 20)
 
+def test_clean_fast_path():
+    """Test that the already-clean check agrees with the full cleaner"""
+    print("\nTesting Clean Name Fast Path...")
+    print("=" * 50)
+    
+    names = [
+        "normal_filename.f3d", "My Project File.f3d", "Component_1", "Component 1",
+        "UPPERCASE", "lower", "_leading", "trailing_", "double__underscore",
+        "a--b", "-edge-", "Drawing (1)", "测试文件", "Café", "ÉCOLE", "", "_",
+        "unnamed_file", "tab\tname", "new\nline", "trailing\n", "aA-", "xAx",
+    ]
+    option_sets = []
+    for replace_spaces in (True, False):
+        for replace_special in (True, False):
+            for replace_unicode in (True, False):
+                for to_lowercase in (True, False):
+                    for replacement_char in ('_', '-', '', ' ', '.', 'ab', 'A'):
+                        option_sets.append({
+                            'replace_spaces': replace_spaces,
+                            'replace_special': replace_special,
+                            'replace_unicode': replace_unicode,
+                            'to_lowercase': to_lowercase,
+                            'replacement_char': replacement_char
+                        })
+    
+    checked = 0
+    for options in option_sets:
+        cleaner = FileNameCleaner.compile(options)
+        for name in names:
+            # A name reported clean must never be changed by the cleaner
+            if cleaner.is_clean(name):
+                assert cleaner.clean(name) == name, (name, options)
+            expected = cleaner.clean(name)
+            assert cleaner.clean_if_dirty(name) == (expected if expected != name else None), (name, options)
+            checked += 1
+    
+    assert FileNameCleaner.has_special_characters("My Project File.f3d")
+    assert not FileNameCleaner.has_special_characters("Component_1")
+    print(f"Checked {checked} name/option combinations")
+
+def test_clean_result_cache():
+    """Test LRU eviction, counters and concurrent use of the name cache"""
+    print("\nTesting Clean Result Cache...")
+    print("=" * 50)
+    
+    import threading
+    
+    cache = CleanResultCache(max_size=2)
+    underscore = FileNameCleaner.compile({'replacement_char': '_'})
+    hyphen = FileNameCleaner.compile({'replacement_char': '-'})
+    
+    assert cache.clean(underscore, "Component 1") == "Component_1"
+    assert cache.clean(hyphen, "Component 1") == "Component-1"  # separate entry per option set
+    assert cache.clean(underscore, "Component 1") == "Component_1"
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 0)
+    
+    # Least recently used entry (hyphen) is evicted first
+    cache.clean(underscore, "Drawing (1)")
+    assert cache.evictions == 1
+    cache.clean(underscore, "Component 1")
+    assert cache.hits == 2
+    cache.clean(hyphen, "Component 1")
+    assert cache.misses == 4
+    
+    # An empty cache is still used, not swapped for another one
+    empty = CleanResultCache()
+    assert underscore.clean_if_dirty("Component 1", empty) == "Component_1"
+    assert underscore.clean_if_dirty("Component 1", empty) == "Component_1"
+    assert (empty.hits, empty.misses, len(empty)) == (1, 1, 1)
+    
+    # Concurrent lookups keep the counters consistent
+    cache = CleanResultCache(max_size=50)
+    names = [f"Copy of Part {i % 100}" for i in range(2000)]
+    
+    def worker():
+        for name in names:
+            assert cache.clean(underscore, name) == underscore.clean(name)
+    
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert cache.hits + cache.misses == 4 * len(names)
+    assert len(cache) <= 50
+    print(cache.get_summary())
+
+def test_aimd_concurrency():
+    """Test the AIMD controller against a latency-injecting fake API"""
+    print("\nTesting AIMD Concurrency Controller...")
+    print("=" * 50)
+    
+    # The fake service slows down and fails calls beyond 4 concurrent requests
+    api = FakeCloudApi(latency=0.002, capacity=4, overload_error_rate=0.5)
+    hub = build_fake_hub(api, depth=2, folders_per_folder=12, files_per_folder=2)
+    root = hub.projects[0].rootFolder
+    
+    controller = AIMDController('test', initial_limit=2, max_limit=32, window_size=8)
+    scanned = [f for _, files in walk_folder_tree(root, controller) for f in files]
+    expected = [f for _, files in walk_folder_tree(root) for f in files]
+    
+    # Failed listings are retried, so nothing is lost and order matches a sequential walk
+    assert scanned == expected
+    assert api.max_in_flight <= 32
+    # Overload errors must have cut the limit below the maximum
+    assert controller.settled_limit() < 32
+    assert any(later < earlier for earlier, later in zip(controller.history, controller.history[1:]))
+    print(controller.get_summary())
+    print(f"Service errors: {api.errors}, max in flight: {api.max_in_flight}")
+    
+    # Renames go through the same controller
+    api.overload_error_rate = 0
+    files_to_rename = [{'data_file': f, 'original_name': f.name, 'new_name': f.name + '_x'} for f in scanned]
+    renamed_count, failed_files = rename_files(files_to_rename, controller)
+    assert renamed_count == len(scanned) and not failed_files
+    assert all(f.name.endswith('_x') for f in scanned)
+    
+    # Each run reports its own calls; the learned limit carries over
+    limit = controller.limit
+    controller.reset_stats()
+    assert (controller.total_calls, controller.total_errors, controller.history) == (0, 0, [])
+    assert controller.limit == limit
+    
+    # Only the most recent windows are kept
+    bounded = AIMDController('bounded', window_size=1, max_history=4)
+    bounded.map(lambda item: item, range(10))
+    assert len(bounded.history) == 4 and bounded.total_calls == 10
+
+def test_cached_folder_adapter():
+    """Test that cached folders fetch children and properties only once"""
+    print("\nTesting Cached Folder Adapter...")
+    print("=" * 50)
+    
+    api = FakeCloudApi()
+    hub = build_fake_hub(api, depth=2, folders_per_folder=3, files_per_folder=4)
+    raw_root = hub.projects[0].rootFolder
+    expected = [(f.name, f.fileExtension) for _, files in walk_folder_tree(raw_root) for f in files]
+    
+    root = wrap_folder(raw_root)
+    first = [(f.name, f.fileExtension, f.parentFolder.path) for _, files in walk_folder_tree(root) for f in files]
+    assert [entry[:2] for entry in first] == expected
+    assert first[-1][2] == 'Project_0 > Folder_0_2 > Folder_1_2'
+    
+    # A second pass over the same adapters never touches the API
+    api.reset_counters()
+    second = [(f.name, f.fileExtension, f.parentFolder.path) for _, files in walk_folder_tree(root) for f in files]
+    assert second == first
+    assert api.property_accesses == 0
+    
+    # Renames write through to the cloud file and update the cached name
+    cached_file = root.dataFiles[0]
+    cached_file.name = 'Renamed'
+    assert cached_file.data_file.name == 'Renamed' and cached_file.name == 'Renamed'
+    
+    # Collections without asArray are read in one count/item pass
+    class Collection:
+        def __init__(self, items):
+            self.items = items
+            self.count = len(items)
+        def item(self, i):
+            return self.items[i]
+    assert materialize(Collection([1, 2, 3])) == [1, 2, 3]
+
+def test_folder_rules():
+    """Test folder glob rules and subtree pruning"""
+    print("\nTesting Folder Rules...")
+    print("=" * 50)
+    
+    rules = FolderRules(exclude='*/Archive/**, **/Obsolete; * > Imports > Vendor > **')
+    assert rules.is_excluded('Project > Archive')
+    assert rules.is_excluded('Project/archive/2019/Old')
+    assert rules.is_excluded('Project > Designs > Obsolete')
+    assert rules.is_excluded('Project > Imports > Vendor > Parts')
+    assert not rules.is_excluded('Project > Designs > Archive')
+    assert not rules.is_excluded('Project > Imports')
+    
+    include = FolderRules(include='*/Designs/**')
+    assert include.may_contain_included('Project') and not include.is_included('Project')
+    assert include.is_included('Project > Designs > Brackets')
+    assert not include.may_contain_included('Project > Drawings')
+    
+    api = FakeCloudApi()
+    hub = FakeDataHub(api)
+    root = hub.add_project('Project').rootFolder
+    root.add_file('Top level')
+    archive = root.add_folder('Archive')
+    for i in range(5):
+        archive.add_folder(f'Year {i}').add_file('Old part')
+    designs = root.add_folder('Designs')
+    designs.add_file('Bracket v2')
+    designs.add_folder('Obsolete').add_file('Old bracket')
+    
+    rules = FolderRules(exclude='*/Archive/**, **/Obsolete')
+    api.reset_counters()
+    names = [f.name for _, files in walk_folder_tree(wrap_folder(root), folder_rules=rules) for f in files]
+    assert names == ['Top level', 'Bracket v2']
+    assert rules.pruned_folders == 2
+    # Root and Designs are listed (files + folders each); pruned subtrees never are
+    assert api.remote_calls == 4
+    
+    rules = FolderRules(include='*/Designs/**')
+    names = [f.name for _, files in walk_folder_tree(wrap_folder(root), folder_rules=rules) for f in files]
+    assert names == ['Bracket v2', 'Old bracket']
+    assert rules.pruned_folders == 1
+    print(rules.get_summary())
+
+def test_reference_graph():
+    """Test reference counts, lookup caching and leaf-first ordering"""
+    print("\nTesting Reference Graph...")
+    print("=" * 50)
+    
+    import csv
+    import tempfile
+    
+    api = FakeCloudApi()
+    folder = FakeDataHub(api).add_project('Project').rootFolder
+    top = folder.add_file('Top Assembly')
+    frame = folder.add_file('Frame Assembly')
+    arm = folder.add_file('Arm Assembly')
+    bolt = folder.add_file('M6 Bolt')
+    plate = folder.add_file('Base Plate')
+    top.add_reference(frame)
+    top.add_reference(arm)
+    frame.add_reference(bolt)
+    arm.add_reference(bolt)
+    frame.add_reference(plate)
+    
+    files_to_rename = [{'data_file': f, 'original_name': f.name, 'new_name': f.name.replace(' ', '_')}
+                       for f in (top, bolt, frame, plate)]
+    
+    graph = ReferenceGraph(batch_size=2).build([file_info['data_file'] for file_info in files_to_rename])
+    graph.annotate(files_to_rename)
+    by_name = {file_info['original_name']: file_info for file_info in files_to_rename}
+    assert by_name['M6 Bolt']['inbound_references'] == 2
+    assert by_name['M6 Bolt']['affected_files'] == 3
+    assert sorted(by_name['M6 Bolt']['referenced_by']) == ['Arm Assembly', 'Frame Assembly']
+    assert by_name['Top Assembly']['inbound_references'] == 0
+    
+    # The shared Top Assembly is reached through several parents but fetched once
+    assert graph.lookups == 5
+    
+    ordered = [file_info['original_name'] for file_info in graph.leaf_first(files_to_rename)]
+    assert ordered == ['M6 Bolt', 'Base Plate', 'Frame Assembly', 'Top Assembly']
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_path = os.path.join(temp_dir, 'dry_run.csv')
+        assert write_dry_run_csv(csv_path, files_to_rename) == 4
+        with open(csv_path, newline='', encoding='utf-8') as csv_file:
+            rows = list(csv.DictReader(csv_file))
+    assert rows[1]['original_name'] == 'M6 Bolt' and rows[1]['inbound_references'] == '2'
+    print(graph.get_summary())
+
+def test_scan_estimate():
+    """Test the sampled scan estimate against a full walk"""
+    print("\nTesting Scan Estimate...")
+    print("=" * 50)
+    
+    import random
+    
+    # Irregular folder trees so the estimate has real variance
+    rng = random.Random(3)
+    api = FakeCloudApi()
+    hub = FakeDataHub(api)
+    
+    def fill(folder, level):
+        for i in range(rng.randint(0, 30)):
+            folder.add_file(f'Part {i}' if rng.random() < 0.2 else f'Part_{i}')
+        if level < 4:
+            for i in range(rng.randint(1, 5)):
+                fill(folder.add_folder(f'Folder_{i}'), level + 1)
+    
+    for p in range(3):
+        fill(hub.add_project(f'Project_{p}').rootFolder, 0)
+    
+    cleaner = FileNameCleaner.compile()
+    roots = [project.rootFolder for project in hub.projects]
+    all_files = [f for root in roots for _, files in walk_folder_tree(root) for f in files]
+    dirty_count = sum(1 for f in all_files if cleaner.clean_if_dirty(f.name))
+    
+    estimate = ScanEstimator(cleaner, api_budget=600, seed=7).estimate(roots)
+    print(estimate.get_summary())
+    print(f"Actual files: {len(all_files)}, actual files to rename: {dirty_count}")
+    
+    assert estimate.projects == 3 and estimate.probes > 3
+    # The budget is only exceeded by the probes in progress when it ran out
+    assert estimate.api_calls < 600 + 3 * 60
+    assert estimate.files.low <= len(all_files) <= estimate.files.high
+    assert estimate.dirty_files.low <= dirty_count <= estimate.dirty_files.high
+    assert estimate.dirty_ratio.low <= dirty_count / len(all_files) <= estimate.dirty_ratio.high
+    
+    # A project smaller than its share of the budget stops once probes are free
+    api = FakeCloudApi()
+    tiny = build_fake_hub(api, depth=1, folders_per_folder=2, files_per_folder=3)
+    estimator = ScanEstimator(cleaner, api_budget=300, seed=1)
+    estimate = estimator.estimate([tiny.projects[0].rootFolder])
+    assert estimate.api_calls < 300 and estimate.probes <= estimator.max_probes
+    assert estimate.folders.value == 3 and estimate.files.value == 9
+    
+    # Folder rules apply to the project root, and only included folders count files
+    api = FakeCloudApi()
+    hub = FakeDataHub(api)
+    kept = hub.add_project('Kept').rootFolder
+    for i in range(50):
+        kept.add_file(f'Root Part {i}')
+    kept.add_folder('Designs').add_file('Bracket v2')
+    hub.add_project('Archive').rootFolder.add_file('Old Part')
+    rules = FolderRules(include='*/Designs/**', exclude='Archive')
+    estimate = ScanEstimator(cleaner, api_budget=300, folder_rules=rules, seed=1).estimate(
+        [project.rootFolder for project in hub.projects])
+    assert estimate.folders.value == 2
+    assert estimate.files.value == 1 and estimate.dirty_files.value == 1
+    
+    # A hub with more projects than the budget covers: a subset is sampled and extrapolated
+    rng = random.Random(0)
+    api = FakeCloudApi()
+    hub = FakeDataHub(api)
+    for p in range(200):
+        project_root = hub.add_project(f'Project_{p}').rootFolder
+        for i in range(rng.randint(0, 30)):
+            project_root.add_file(f'Part {i}' if rng.random() < 0.2 else f'Part_{i}')
+        for i in range(rng.randint(1, 4)):
+            sub_folder = project_root.add_folder(f'Folder_{i}')
+            for j in range(rng.randint(0, 30)):
+                sub_folder.add_file(f'Part_{j}')
+    roots = [project.rootFolder for project in hub.projects]
+    file_count = sum(len(files) for root in roots for _, files in walk_folder_tree(root))
+    estimate = ScanEstimator(cleaner, api_budget=300, seed=0).estimate(roots)
+    print(estimate.get_summary())
+    assert 1 < estimate.projects < 200 and estimate.project_count == 200
+    assert estimate.api_calls < 400
+    assert estimate.files.low <= file_count <= estimate.files.high
+    assert estimate.dirty_ratio.low is not None
+
+def test_cloud_index():
+    """Test that the warm index serves repeat scans from memory and follows events"""
+    print("\nTesting Warm Cloud Index...")
+    print("=" * 50)
+    
+    api = FakeCloudApi()
+    hub = build_fake_hub(api, depth=2, folders_per_folder=3, files_per_folder=5)
+    raw_root = hub.projects[0].rootFolder
+    index = CloudIndex()
+    
+    def scan():
+        return sorted(f.name for _, files in index.walk(index.get_folder(raw_root)) for f in files)
+    
+    first = scan()
+    assert index.folders_listed == 13 and index.folders_from_memory == 0
+    
+    # Repeat scans only read the root folder id to find it in the index
+    api.reset_counters()
+    index.reset_stats()
+    assert scan() == first
+    assert api.property_accesses == 1 and api.remote_calls == 0
+    assert index.folders_from_memory == 13 and index.folders_listed == 0
+    
+    # A file uploaded to a subfolder: only that folder is listed again
+    target = raw_root.folders[1].folders[2]
+    uploaded = target.add_file('New Upload')
+    index.file_changed(uploaded)
+    index.reset_stats()
+    assert 'New Upload' in scan()
+    assert index.folders_listed == 1 and index.folders_from_memory == 12
+    
+    # A moved file: both the old and the new folder are refreshed
+    source = raw_root.folders[0]
+    moved = source.files.pop(0)
+    moved._folder = target
+    target.files.append(moved)
+    index.file_changed(moved)
+    index.reset_stats()
+    names = scan()
+    assert names.count(moved._name) == first.count(moved._name)
+    assert index.folders_listed == 2
+    
+    # A file renamed elsewhere after the scan keeps its newer name, and its folder is refreshed
+    scanned = {f.id: f for _, files in index.walk(index.get_folder(raw_root)) for f in files}
+    renamed_elsewhere = raw_root.folders[2].files[0]
+    original_name = renamed_elsewhere.name
+    renamed_elsewhere.name = 'Renamed In Data Panel'
+    invalidations = index.invalidations
+    renamed_count, failed_files = rename_files(
+        [{'data_file': scanned[renamed_elsewhere.id], 'original_name': original_name, 'new_name': 'Stale_Name'}],
+        on_stale=index.file_changed)
+    assert renamed_count == 0 and len(failed_files) == 1
+    assert renamed_elsewhere.name == 'Renamed In Data Panel'
+    assert index.invalidations > invalidations
+    assert 'Renamed In Data Panel' in scan()
+    print(index.get_summary())
+
+def test_scan_session():
+    """Test that a budgeted scan resumes from its token without gaps or repeats"""
+    print("\nTesting Resumable Scan Session...")
+    print("=" * 50)
+    
+    api = FakeCloudApi()
+    hub = build_fake_hub(api, projects=3, depth=2, folders_per_folder=3, files_per_folder=4)
+    projects = {project.id: project for project in hub.projects}
+    roots = [(project_id, []) for project_id in projects]
+    
+    def root_for_project(project_id):
+        # Fresh adapters each session, as after restarting Fusion
+        return wrap_folder(projects[project_id].rootFolder)
+    
+    expected = sorted(f.id for project in hub.projects
+                      for _, files in walk_folder_tree(project.rootFolder) for f in files)
+    
+    # Unbudgeted: one run covers every project
+    session = ScanSession(roots, root_for_project)
+    found = []
+    assert session.run(lambda folder, files: found.extend(f.id for f in files))
+    assert sorted(found) == expected and session.folders_scanned == 39
+    
+    # Budgeted: each run stops after a few listings and hands over a token
+    found = []
+    token = ScanSession(roots, root_for_project).to_token()
+    runs = 0
+    while token:
+        session = ScanSession.from_token(token, root_for_project, AIMDController(initial_limit=2))
+        finished = session.run(lambda folder, files: found.extend(f.id for f in files), call_budget=10)
+        token = None if finished else session.to_token()
+        runs += 1
+    assert sorted(found) == expected
+    assert runs > 3
+    print(f"Scanned {len(found)} files in {runs} budgeted runs")
+    
+    # Folders removed between runs are skipped, not fatal
+    session = ScanSession(roots[:1], root_for_project)
+    session.run(lambda folder, files: None, call_budget=2)
+    token = session.to_token()
+    hub.projects[0].rootFolder.folders.pop(0)
+    session = ScanSession.from_token(token, root_for_project)
+    assert session.run(lambda folder, files: None)
+    assert session.skipped_folders == 1
+    print(session.get_summary())
+    
+    # Scan roots go through the folder rules like every other folder
+    api = FakeCloudApi()
+    hub = FakeDataHub(api)
+    project = hub.add_project('Project')
+    root = project.rootFolder
+    root.add_file('Top level')
+    archive = root.add_folder('Archive')
+    archive.add_file('Old part')
+    root.add_folder('Designs').add_file('Bracket v2')
+    
+    def scan_names(roots, rules):
+        names = []
+        session = ScanSession(roots, lambda project_id: wrap_folder(root), folder_rules=rules)
+        session.run(lambda folder, files: names.extend(f.name for f in files))
+        return names
+    
+    rules = FolderRules(include='*/Designs/**')
+    expected = [f.name for _, files in walk_folder_tree(wrap_folder(root), folder_rules=rules) for f in files]
+    assert scan_names([(project.id, [])], FolderRules(include='*/Designs/**')) == expected == ['Bracket v2']
+    assert scan_names([(project.id, [archive.id])], FolderRules(exclude='*/Archive')) == []
+    
+    # Folders that can't be listed, or whose visit fails, are kept in the token
+    class FlakyFolder(type(root)):
+        failures = 0
+        
+        @property
+        def dataFiles(self):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('Listing failed')
+            return super().dataFiles
+    
+    flaky = FlakyFolder(api, 'Flaky', root, project)
+    flaky.add_file('Flaky part')
+    flaky.failures = 3
+    root.folders.append(flaky)
+    
+    found = []
+    session = ScanSession([(project.id, [])], lambda project_id: wrap_folder(root))
+    assert not session.run(lambda folder, files: found.extend(f.name for f in files))
+    assert session.stop_reason == 'error' and 'stopped by an error' in session.get_summary()
+    
+    broken = {'Flaky'}
+    
+    def visit(folder, files):
+        if folder.name in broken:
+            broken.clear()
+            raise RuntimeError('Visit failed')
+        found.extend(f.name for f in files)
+    
+    session = ScanSession.from_token(session.to_token(), lambda project_id: wrap_folder(root))
+    try:
+        session.run(visit)
+        assert False, 'visit error should be raised'
+    except RuntimeError:
+        assert session.stop_reason == 'error'
+    
+    session = ScanSession.from_token(session.to_token(), lambda project_id: wrap_folder(root))
+    assert session.run(visit)
+    assert sorted(found) == ['Bracket v2', 'Flaky part', 'Old part', 'Top level']
+
+def test_duplicate_name_report():
+    """Test that names clashing after cleaning are clustered, with and without spilling"""
+    print("\nTesting Duplicate Name Report...")
+    print("=" * 50)
+    
+    import tempfile
+    
+    cleaner = FileNameCleaner.compile(None)
+    files = [('Bracket v2', 'f3d', f'Project_{p}') for p in range(5)]
+    files += [('bracket_v2', 'f3d', 'Project_0 > Parts'), ('Bracket v2', 'f2d', 'Project_0'),
+              ('Housing#Top', 'f3d', 'Project_1'), ('Housing Top', 'f3d', 'Project_2'),
+              ('Unique Part', 'f3d', 'Project_3')]
+    files += [(f'Part_{i}', 'f3d', 'Project_4') for i in range(200)]
+    
+    def cluster_sizes(report):
+        for name, extension, location in files:
+            report.add(name, extension, location)
+        return {key: len(entries) for key, entries in report.clusters()}
+    
+    with DuplicateNameReport(cleaner) as report:
+        in_memory = cluster_sizes(report)
+        assert report.spills == 0
+    assert in_memory == {'bracket_v2.f3d': 6, 'housing_top.f3d': 2}
+    
+    with DuplicateNameReport(cleaner, max_in_memory=7, partitions=4) as report:
+        assert cluster_sizes(report) == in_memory
+        assert report.spills > 10
+        spill_path = report._spill_path
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'duplicates.csv')
+            assert write_duplicate_report_csv(csv_path, report) == 2
+            with open(csv_path, encoding='utf-8') as csv_file:
+                assert len(csv_file.readlines()) == 1 + 8
+        print(report.get_summary())
+    assert not os.path.exists(spill_path)
+    
+    with DuplicateNameReport(cleaner, min_cluster_size=3) as report:
+        assert cluster_sizes(report) == {'bracket_v2.f3d': 6}
+        assert 'partial' not in report.get_summary()
+        report.partial = True
+        assert 'partial' in report.get_summary()
+
+def test_option_comparison():
+    """Test that several option sets are compared on the same names in one pass"""
+    print("\nTesting Option Set Comparison...")
+    print("=" * 50)
+    
+    import csv
+    import tempfile
+    
+    # Overrides equal to the selection are compared once and reported as skipped
+    comparison = OptionComparison({'replacement_char': '_'}, [
+        {'replacement_char': '-'},
+        {'to_lowercase': True},
+        {'replacement_char': '_'},
+    ])
+    assert comparison.labels == ['selected', "replacement_char '-'", 'to_lowercase on']
+    assert comparison.skipped == ["replacement_char '_'"]
+    
+    # 'unnamed file' cleans to unnamed_file without being an empty-name fallback
+    comparison.add_folder('Project_0', [
+        ('Bracket v2', 'f3d'), ('Bracket_v2', 'f3d'), ('bracket_v2', 'f2d'),
+        ('测试', 'f3d'), ('Clean_Name', 'f3d'), ('unnamed file', 'f3d'),
+    ])
+    comparison.add_folder('Project_0 > Parts', [('Housing#Top', 'f3d'), ('Housing_Top', 'f3d')])
+    
+    defaults, hyphen, lowercase = comparison.stats
+    assert (defaults.files_changed, defaults.collisions, defaults.empty_fallbacks) == (4, 6, 1)
+    assert (hyphen.files_changed, hyphen.collisions, hyphen.empty_fallbacks) == (4, 0, 1)
+    assert (lowercase.files_changed, lowercase.collisions, lowercase.empty_fallbacks) == (7, 6, 1)
+    
+    # Every file the option sets rename differently, in scan order
+    assert comparison.disagreements == 6
+    assert comparison.differences[0] == ('Project_0', 'Bracket v2', ['Bracket_v2', 'Bracket-v2', 'bracket_v2'])
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_path = os.path.join(temp_dir, 'comparison.csv')
+        assert write_option_comparison_csv(csv_path, comparison) == 6
+        with open(csv_path, newline='', encoding='utf-8') as csv_file:
+            rows = list(csv.reader(csv_file))
+        assert rows[0] == ['location', 'original_name'] + comparison.labels
+    
+    comparison.partial = True
+    summary = comparison.get_summary()
+    assert 'Partial comparison' in summary
+    assert "Skipped as the same as an earlier set: replacement_char '_'" in summary
+    print(summary)
+
 def main():
     """Run all tests"""
     print("Fusion 360 File Renamer - Utility Tests")
@@ -110,6 +708,17 @@ def main():
         test_filename_cleaning()
         test_rename_preview()
         test_edge_cases()
+        test_clean_fast_path()
+        test_clean_result_cache()
+        test_aimd_concurrency()
+        test_cached_folder_adapter()
+        test_folder_rules()
+        test_reference_graph()
+        test_scan_estimate()
+        test_cloud_index()
+        test_scan_session()
+        test_duplicate_name_report()
+        test_option_comparison()
         
         print("\n✓ All tests completed successfully!")
         print("The utility functions are working correctly.")